@@ -0,0 +1,182 @@
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from dotenv import load_dotenv
+
+# Add the code directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = './data/BENCH_SCRAPERS.json'
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def run_dataroma_insider():
+    from helper.dataroma_processor import DataromaScraper
+    df = DataromaScraper().scrape_insider_buy_data('/m/ins/ins.php?t=w&po=1&am=10000&sym=&o=fd&d=d&L=1')
+    return len(df)
+
+
+def run_dataroma_home():
+    from helper.dataroma_processor import DataromaScraper
+    return sum(len(df) for df in DataromaScraper().scrape_home_data())
+
+
+def run_finviz():
+    from helper.finviz_processor import FinvizScraper
+    with open('./data/FINVIZ_SCREEN.json', 'r') as f:
+        screens = json.load(f)
+    scraper = FinvizScraper(screens)
+    scraper.fetch_data()
+    return 0 if scraper.df is None else len(scraper.df)
+
+
+def run_magic():
+    from helper.magic_processor import MagicFormulaInvesting
+    with open('./data/MAGIC_SCREEN.json', 'r') as f:
+        variants = json.load(f)
+    # Credentials are only sent while recording; fixture keys ignore them. No saved session, so every
+    # run goes through the login pages
+    mfi = MagicFormulaInvesting(os.getenv('MAGIC_USER', 'replay'), os.getenv('MAGIC_PW', 'replay'), session_path=None)
+    df = mfi.get_stock_screenings(variants)
+    return 0 if df is None else len(df)
+
+
+def run_sec():
+    from helper.sec_processor import SecProcessor
+    from helper.sec_cache import SecCache
+    with open('./data/CIK_LIST.json', 'r') as f:
+        cik_list = json.load(f)
+    # A fresh cache so every document goes through the fixture store
+    df = SecProcessor(cik_list, cache=SecCache(tempfile.mkdtemp())).process_all_funds()
+    return 0 if df is None else len(df)
+
+
+SCRAPERS = {
+    'dataroma_insider': run_dataroma_insider,
+    'dataroma_home': run_dataroma_home,
+    'finviz': run_finviz,
+    'magic': run_magic,
+    'sec': run_sec,
+}
+
+
+def measure(name, function, store, repeat):
+    """
+    Run a scraper against the fixture store and keep its fastest run. Pages are the responses served
+    by the store, so the numbers cover fetch bookkeeping plus parsing, never the network or a limiter.
+    """
+    from helper.rate_limiter import total_wait_seconds
+    best = None
+    for _ in range(repeat):
+        pages_before = store.stats['replayed'] + store.stats['recorded']
+        missing_before = store.stats['missing']
+        waited_before = total_wait_seconds()
+        tracemalloc.start()
+        try:
+            start_time = time.perf_counter()
+            rows = function()
+            elapsed = time.perf_counter() - start_time
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        pages = store.stats['replayed'] + store.stats['recorded'] - pages_before
+        # Scrapers log and skip pages they could not fetch, so an unrecorded page would only show up as fewer rows
+        if store.stats['missing'] > missing_before:
+            raise RuntimeError(f"{store.stats['missing'] - missing_before} requests have no recorded fixture")
+        # Throttling belongs in HttpClient, which skips it in replay; a wait here would be timed as parsing
+        if store.mode == 'replay' and total_wait_seconds() > waited_before:
+            raise RuntimeError(f"waited {total_wait_seconds() - waited_before:.2f}s on a rate limiter during replay")
+        if best is None or elapsed < best['seconds']:
+            best = {
+                'pages': pages,
+                'rows': rows,
+                'seconds': elapsed,
+                'pages_per_sec': pages / elapsed if elapsed else 0.0,
+                'rows_per_sec': rows / elapsed if elapsed else 0.0,
+                'peak_mb': peak / 1e6,
+            }
+    return best
+
+
+def compare(name, result, baseline, tolerance):
+    """
+    :return: List of regression messages against the stored baseline.
+    """
+    if not baseline:
+        return []
+    regressions = []
+    if result['rows'] != baseline['rows'] or result['pages'] != baseline['pages']:
+        regressions.append(f"{name}: parsed {result['rows']} rows from {result['pages']} pages, "
+                           f"baseline {baseline['rows']} rows from {baseline['pages']} pages")
+    if result['rows_per_sec'] < baseline['rows_per_sec'] * (1 - tolerance):
+        regressions.append(f"{name}: {result['rows_per_sec']:,.0f} rows/s, baseline {baseline['rows_per_sec']:,.0f} rows/s")
+    if result['peak_mb'] > baseline['peak_mb'] * (1 + tolerance):
+        regressions.append(f"{name}: peak {result['peak_mb']:.1f} MB, baseline {baseline['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(names, repeat, record, update_baseline, tolerance):
+    """
+    :return: Exit status: 1 when fixtures or baselines are missing, a scraper failed or a result regressed.
+    """
+    load_dotenv('./.env')
+    os.environ['HTTP_FIXTURE_MODE'] = 'record' if record else 'replay'
+    from helper.http_client import get_fixture_store
+    store = get_fixture_store()
+
+    if not record and not os.listdir(store.directory):
+        logger.error(f"No fixtures in {store.directory}; record them with `make record-fixtures`")
+        return 1
+
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r') as f:
+            baselines = json.load(f)
+
+    results = {}
+    failures = []
+    for name in names:
+        try:
+            result = measure(name, SCRAPERS[name], store, 1 if record else repeat)
+        except Exception as e:
+            failures.append(f"{name}: {e}")
+            continue
+        results[name] = result
+        logger.info(f"{name}: {result['pages']} pages, {result['rows']} rows in {result['seconds']:.3f}s "
+                    f"({result['pages_per_sec']:,.1f} pages/s, {result['rows_per_sec']:,.0f} rows/s, "
+                    f"peak {result['peak_mb']:.1f} MB)")
+        if record or update_baseline:
+            continue
+        if name not in baselines:
+            failures.append(f"{name}: no baseline in {BASELINE_PATH}; write one with --update-baseline")
+            continue
+        failures.extend(f"REGRESSION {regression}" for regression in compare(name, result, baselines[name], tolerance))
+
+    if record:
+        logger.info(f"Recorded {store.stats['recorded']} responses into {store.directory}")
+    elif update_baseline and results:
+        baselines.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baselines, f, indent=4)
+        logger.info(f"Baselines for {', '.join(results)} written to {BASELINE_PATH}")
+    for failure in failures:
+        logger.error(failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scrapers', nargs='*', default=list(SCRAPERS), choices=list(SCRAPERS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--record', action='store_true', help='Fetch live pages once and store them as fixtures')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown / memory growth')
+    args = parser.parse_args()
+    sys.exit(main(args.scrapers, args.repeat, args.record, args.update_baseline, args.tolerance))
@@ -0,0 +1,100 @@
+import sys
+import os
+import time
+import datetime
+import argparse
+import numpy as np
+import pandas as pd
+
+# Add the code directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper.sec_processor import SecProcessor
+
+
+def legacy_clean_dataframe(df, date_part):
+    """
+    Row-wise implementation SecProcessor._clean_dataframe replaced, kept here as the benchmark baseline.
+    """
+    column = ['name_of_issuer', 'title_of_class', 'cusip', 'figi', 'value', 'prn_amt', 'prn',
+              'put_call', 'discretion', 'manager', 'voting_sole', 'voting_shared', 'voting_none']
+    column_2 = ['name_of_issuer', 'title_of_class', 'cusip', 'value', 'prn_amt', 'prn',
+                'put_call', 'discretion', 'manager', 'voting_sole', 'voting_shared', 'voting_none']
+    col_int = ['value', 'prn_amt', 'voting_sole', 'voting_shared', 'voting_none']
+
+    col_length = len(df.columns)
+    if col_length == 13:
+        df.columns = column
+    else:
+        df.columns = column_2
+        df['figi'] = np.nan
+        df = df[column]
+
+    df['trans_date'] = datetime.datetime.strptime(date_part, '%Y-%m-%d')
+    df[col_int] = df[col_int].apply(pd.to_numeric, errors='coerce')
+
+    for col in df.columns:
+        df[col] = df[col].apply(lambda x: x if pd.isna(x) else str(x).replace('\n', ' '))
+
+    df['value'] = df['value'].apply(lambda x: x if not isinstance(x, str) or ',' not in x else x.split(','))
+    df = df.explode('value')
+    df['value'] = df['value'].apply(lambda x: x.strip())
+
+    df['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
+    return df
+
+
+def make_information_table(rows, seed=0):
+    """
+    Synthetic 13-column information table shaped like _parse_xml_response output.
+    """
+    rng = np.random.default_rng(seed)
+    issuers = np.array([f'ISSUER {i}\nCORP' for i in range(500)], dtype=object)
+    return pd.DataFrame({
+        0: issuers[rng.integers(0, len(issuers), rows)],
+        1: rng.choice(['COM', 'CL A', 'SPONSORED ADR\n'], rows),
+        2: [f'{i:09d}' for i in rng.integers(0, 10**9, rows)],
+        3: rng.choice([None, 'BBG000BLNNH6'], rows),
+        4: rng.integers(1, 10**9, rows),
+        5: rng.integers(1, 10**8, rows),
+        6: rng.choice(['SH', 'PRN'], rows),
+        7: rng.choice([None, 'Put', 'Call'], rows),
+        8: rng.choice(['SOLE', 'DFND', 'OTR'], rows),
+        9: rng.choice([None, '1', '1,2,3'], rows),
+        10: rng.integers(0, 10**8, rows),
+        11: rng.integers(0, 10**6, rows),
+        12: rng.integers(0, 10**6, rows),
+    })
+
+
+def time_call(function, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        frame = df.copy()
+        start_time = time.perf_counter()
+        function(frame, '2024-05-15')
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main(rows, repeat):
+    df = make_information_table(rows)
+    processor = SecProcessor([])
+
+    legacy_seconds = time_call(legacy_clean_dataframe, df, repeat)
+    vectorized_seconds = time_call(processor._clean_dataframe, df, repeat)
+
+    cleaned = processor._clean_dataframe(df.copy(), '2024-05-15')
+    print(f"Rows: {rows}")
+    print(f"Legacy row-wise clean: {legacy_seconds:.3f}s ({rows / legacy_seconds:,.0f} rows/s)")
+    print(f"Vectorized clean:      {vectorized_seconds:.3f}s ({rows / vectorized_seconds:,.0f} rows/s)")
+    print(f"Speedup: {legacy_seconds / vectorized_seconds:.1f}x")
+    print(f"Output dtypes: {dict(cleaned.dtypes.astype(str))}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -1,3 +1,4 @@
+import json
 import logging
 import os
 from typing import Dict
@@ -49,14 +50,12 @@ def main():
             logger=logger
         )
         
-        # Finviz scraper URL
-        url = ('https://finviz.com/screener.ashx?v=151&f=cap_microover,fa_curratio_o2,'
-               'fa_eps5years_o5,fa_opermargin_o10,fa_roe_pos,fa_sales5years_o5,geo_usa,'
-               'sh_insiderown_o10,sh_insidertrans_neg,sh_outstanding_o1,sh_price_o4,'
-               'ta_highlow52w_b30h&ft=4&o=change')
+        # Named Finviz screens, all written to finviz_screen with their screen_name
+        with open('./data/FINVIZ_SCREEN.json', 'r') as f:
+            screens = json.load(f)
         
         # Initialize FinvizScraper and fetch data
-        scraper = FinvizScraper(url)
+        scraper = FinvizScraper(screens, logger=logger)
         scraper.fetch_data()
         
         # Table name for SQL database
@@ -0,0 +1,55 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Shipped map, resolved against the repository so it loads from any working directory
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                            'data', 'CUSIP_MAP.json')
+
+
+class CusipMap:
+    """
+    Read-only CUSIP -> ticker index. CUSIPs are kept in one sorted fixed-width numpy array and looked up
+    with a vectorized binary search (np.searchsorted), so a whole information table resolves in one call
+    without building a Python dict of ~13k entries per process.
+    """
+
+    def __init__(self, mapping):
+        """
+        :param mapping: Dict of CUSIP -> ticker.
+        """
+        cusips = np.array([self._normalize(cusip) for cusip in mapping], dtype='U9')
+        tickers = np.array(list(mapping.values()), dtype=object)
+        order = np.argsort(cusips, kind='stable')
+        self.cusips = cusips[order]
+        self.tickers = tickers[order]
+
+    @classmethod
+    def from_json(cls, file_path):
+        with open(file_path, 'r') as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _normalize(cusip):
+        return str(cusip).strip().upper()
+
+    def __len__(self):
+        return len(self.cusips)
+
+    def lookup(self, cusips):
+        """
+        Resolve a Series of CUSIPs to tickers; unknown or missing CUSIPs map to None.
+        """
+        if len(self.cusips) == 0:
+            return pd.Series(None, index=cusips.index, dtype=object)
+        normalized = cusips.fillna('').astype(str).str.strip().str.upper()
+        keys = normalized.to_numpy(dtype='U9')
+        positions = np.searchsorted(self.cusips, keys)
+        positions[positions == len(self.cusips)] = 0
+        # Longer strings are truncated by the U9 cast, so they must not count as a match
+        found = (self.cusips[positions] == keys) & (normalized.str.len() <= 9).to_numpy()
+        return pd.Series(np.where(found, self.tickers[positions], None), index=cusips.index, dtype=object)
+
+    def to_frame(self):
+        return pd.DataFrame({'cusip': self.cusips.astype(object), 'ticker': self.tickers})
@@ -1,20 +1,29 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import datetime
+from helper.http_client import get_http_client
 
 pd.options.mode.chained_assignment = None 
 
 class DataromaScraper:
-    def __init__(self):
+    INSIDER_COLUMNS = ['filing', 'symbol', 'security', 'reporting_name', 'relationship', 'trans_date',
+                       'purchase_sale', 'shares', 'price', 'amount', 'di']
+
+    def __init__(self, http_client=None, max_workers=8):
+        """
+        :param max_workers: Insider pages fetched and parsed concurrently.
+        """
         self.base_url = 'https://www.dataroma.com'
+        self.http = http_client or get_http_client()
+        self.max_workers = max_workers
         self.header = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         }
 
     def make_request(self, path_url):
         url = self.base_url + path_url
-        result = requests.get(url, headers=self.header)
+        result = self.http.get(url, headers=self.header)
         return result
 
     def get_soup_page_list(self, soup):    
@@ -28,30 +37,42 @@ class DataromaScraper:
         hrefs = sorted(list(hrefs))[1:]
         return hrefs
 
-    def get_table_data(self, soup):
-        tables = soup.find_all('table')[2]
-        table_data = []
+    def get_table_columns(self, soup, columns):
+        """
+        Read the third table of an insider page into one list per column, skipping the header row and
+        any row that does not have one cell per column.
+        """
+        table = soup.find_all('table')[2]
+        data = {col: [] for col in columns}
 
         # Skip column row
-        for tr in tables.find_all('tr')[1:]:
-            cols = tr.find_all('td')
-            cols = [col.text.strip() for col in cols]
-            table_data.append(cols)
-        return table_data
+        for tr in table.find_all('tr')[1:]:
+            cells = tr.find_all('td')
+            if len(cells) != len(columns):
+                continue
+            for col, cell in zip(columns, cells):
+                data[col].append(cell.text.strip())
+        return data
+
+    def scrape_insider_page(self, path_url):
+        # Only <table> elements are built into the tree; the rest of the page is skipped while parsing
+        result = self.make_request(path_url)
+        soup = BeautifulSoup(result.text, 'html.parser', parse_only=SoupStrainer('table'))
+        return self.get_table_columns(soup, self.INSIDER_COLUMNS)
 
     def scrape_insider_buy_data(self, path_url):
         result = self.make_request(path_url)
         soup = BeautifulSoup(result.text, 'html.parser')
         hrefs = self.get_soup_page_list(soup)
-        table_data = self.get_table_data(soup)
+        data = self.get_table_columns(soup, self.INSIDER_COLUMNS)
 
-        columns = ['filing', 'symbol', 'security', 'reporting_name', 'relationship', 'trans_date', 'purchase_sale', 'shares', 'price', 'amount', 'di']
-        for href in hrefs:
-            result = self.make_request(href)
-            soup = BeautifulSoup(result.text, 'html.parser')
-            table_data.extend(self.get_table_data(soup))
+        # Remaining pages in parallel; map keeps the page order
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for page_data in executor.map(self.scrape_insider_page, hrefs):
+                for col, values in page_data.items():
+                    data[col].extend(values)
 
-        df_insider_buy = pd.DataFrame(table_data, columns=columns)
+        df_insider_buy = pd.DataFrame(data)
         df_insider_buy = df_insider_buy.query("symbol != ''")
 
         df_insider_buy['relationship'] = df_insider_buy['relationship'].str.title() \
@@ -86,8 +107,7 @@ class DataromaScraper:
         return rows
 
     def scrape_home_data(self):
-        url = 'https://www.dataroma.com/m/home.php'
-        result = requests.get(url, headers=self.header)
+        result = self.make_request('/m/home.php')
         soup = BeautifulSoup(result.text, 'html.parser')
         tables = soup.find_all('table')
 
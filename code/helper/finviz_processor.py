@@ -1,40 +1,126 @@
-import requests
+import re
+import logging
 from bs4 import BeautifulSoup as bs
 import pandas as pd
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+from helper.http_client import HttpClient
+from helper.rate_limiter import get_rate_limiter
 
 class FinvizScraper:
-    def __init__(self, url):
-        self.url = url
+    PAGE_SIZE = 20  # rows per screener page, paged with the r= offset
+    # Header labels that do not reduce to a readable column name on their own
+    HEADER_NAMES = {'No.': 'index', 'P/E': 'pe', 'Fwd P/E': 'forward_pe', 'P/S': 'ps', 'P/B': 'pb',
+                    'P/C': 'pc', 'P/FCF': 'pfcf', 'EPS': 'eps'}
+    TEXT_COLUMNS = {'ticker', 'company', 'sector', 'industry', 'country', 'earnings', 'ipo_date'}
+
+    def __init__(self, screens, http_client=None, max_workers=4, requests_per_second=2, logger=None):
+        """
+        :param screens: Dict of screen name -> screener URL, or a single URL.
+        :param max_workers: Pages fetched concurrently.
+        :param http_client: HttpClient to fetch with; without one, a client throttled to requests_per_second.
+        :param requests_per_second: Politeness ceiling for finviz.com, shared by every scraper in the process.
+        """
+        self.screens = screens if isinstance(screens, dict) else {'default': screens}
         self.header = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.142.86 Safari/537.36",
         }
+        # The client acquires per attempt (retries included) and never in fixture replay
+        self.http = http_client or HttpClient(rate_limiter=get_rate_limiter('finviz.com', requests_per_second))
+        self.max_workers = max_workers
+        self.logger = logger or logging.getLogger(__name__)
         self.data = None
         self.df = None
-    
+
     def fetch_data(self):
-        response = requests.get(self.url, headers=self.header)
-        if response.status_code == 200:
-            soup = bs(response.content, 'html.parser')
-            table = soup.find('table', class_='styled-table-new is-rounded is-tabular-nums w-full screener_table')
-            if table:
-                self.extract_data(table)
-            else:
-                print("Table not found in the HTML.")
-        else:
-            print(f"Failed to retrieve data. Status code: {response.status_code}")
-
-    def extract_data(self, table):
-        td_tags = table.find_all('td')
-        self.data = [td.get_text(strip=True) for td in td_tags]
-        self.create_dataFrame()
-
-    def create_dataFrame(self):
-        # Assuming that 'data' contains a flat list of table cell values
-        num_columns = 11  # Number of columns in the table
-        rows = [self.data[i:i + num_columns] for i in range(0, len(self.data), num_columns)]
-        
-        columns = ['index', 'ticker', 'company', 'sector', 'industry', 'country', 'market_cap', 'pe', 'volume', 'price', 'change']
-        self.df = pd.DataFrame(rows, columns=columns)
-        self.df ['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
-        self.df.drop(columns=['index'], inplace=True)
\ No newline at end of file
+        frames = []
+        for screen_name, url in self.screens.items():
+            df = self.fetch_screen(screen_name, url)
+            if df is not None:
+                frames.append(df)
+        if frames:
+            self.df = pd.concat(frames, ignore_index=True)
+
+    def fetch_screen(self, screen_name, url):
+        """
+        Fetch every page of one screen: the first page gives the total row count, the remaining
+        offsets are fetched concurrently and reassembled in page order.
+        """
+        soup = self._get_page(url, 1)
+        if soup is None:
+            return None
+        table = soup.find('table', class_='screener_table')
+        if not table:
+            self.logger.error(f"Screen {screen_name}: table not found in the HTML")
+            return None
+
+        columns = self.extract_header(table)
+        rows = self.extract_rows(table)
+        total = self.get_total(soup)
+        offsets = range(1 + self.PAGE_SIZE, total + 1, self.PAGE_SIZE) if total else []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for page_rows in executor.map(lambda offset: self._get_page_rows(url, offset), offsets):
+                rows.extend(page_rows)
+
+        self.data = rows
+        df = self.create_dataFrame(rows, columns)
+        df['screen_name'] = screen_name
+        if total and len(df) != total:
+            # Pages that failed or changed between requests leave the screen incomplete
+            self.logger.warning(f"Screen {screen_name}: expected {total} rows, got {len(df)}")
+        return df
+
+    def _get_page(self, url, offset):
+        response = self.http.get(f'{url}&r={offset}', headers=self.header)
+        if response.status_code != 200:
+            self.logger.error(f"Failed to retrieve {url}&r={offset}. Status code: {response.status_code}")
+            return None
+        return bs(response.content, 'html.parser')
+
+    def _get_page_rows(self, url, offset):
+        soup = self._get_page(url, offset)
+        table = soup.find('table', class_='screener_table') if soup else None
+        return self.extract_rows(table) if table else []
+
+    def get_total(self, soup):
+        # e.g. "#1 / 245 Total"
+        total = soup.find(id='screener-total')
+        text = total.get_text(' ', strip=True) if total else soup.get_text(' ')
+        match = re.search(r'/\s*([\d,]+)\s*Total', text)
+        return int(match.group(1).replace(',', '')) if match else None
+
+    def _header_row(self, table):
+        return table.find('thead') or table.find('tr')
+
+    def extract_header(self, table):
+        labels = [cell.get_text(strip=True) for cell in self._header_row(table).find_all(['th', 'td'])]
+        return [self.HEADER_NAMES.get(label) or re.sub(r'[^0-9a-z]+', '_', label.lower()).strip('_')
+                for label in labels]
+
+    def extract_rows(self, table):
+        header = self._header_row(table)
+        rows = []
+        for tr in table.find_all('tr'):
+            if tr is header or tr.parent is header:
+                continue
+            cells = tr.find_all('td')
+            if cells:
+                rows.append([td.get_text(strip=True) for td in cells])
+        return rows
+
+    def create_dataFrame(self, rows, columns):
+        self.df = pd.DataFrame([row for row in rows if len(row) == len(columns)], columns=columns)
+        for col in self.df.columns:
+            if col not in self.TEXT_COLUMNS and col != 'index':
+                self.df[col] = self.parse_number(self.df[col])
+        self.df['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
+        self.df.drop(columns=['index'], inplace=True, errors='ignore')
+        return self.df
+
+    def parse_number(self, values):
+        # Finviz abbreviates large numbers (e.g. '1.23B'), adds '%' to ratios and uses '-' for missing values
+        multipliers = {'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}
+        values = values.str.strip().str.replace(',', '', regex=False).str.rstrip('%')
+        multiplier = values.str[-1].map(multipliers).fillna(1)
+        return pd.to_numeric(values.str.rstrip('KMBT'), errors='coerce') * multiplier
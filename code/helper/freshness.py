@@ -0,0 +1,62 @@
+import datetime
+import json
+import pandas as pd
+
+FRESHNESS_TABLE = 'yahoofinance_freshness'
+
+
+class FreshnessRegistry:
+    """
+    Last successful fetch date per (ticker, dataset), kept in yahoofinance_freshness. A dataset is due
+    again once it is at least its TTL in days old; datasets without a TTL are due on every run.
+    Statements and the insider roster change a few times a year, so a warm run can skip them entirely.
+    """
+
+    def __init__(self, sql_helper, logger, ttl_days, today=None):
+        """
+        :param ttl_days: Dict of dataset -> days a fetch stays fresh (see data/FRESHNESS_TTL.json).
+        """
+        self.sql_helper = sql_helper
+        self.logger = logger
+        self.ttl_days = ttl_days
+        self.today = today or datetime.date.today()
+        self.fetched = {}
+
+    @classmethod
+    def from_json(cls, sql_helper, logger, file_path='./data/FRESHNESS_TTL.json'):
+        with open(file_path, 'r') as f:
+            return cls(sql_helper, logger, json.load(f))
+
+    def load(self):
+        if not self.sql_helper.table_exists(FRESHNESS_TABLE):
+            return self
+        df = self.sql_helper.fetch_data(f"SELECT ticker, dataset, date_insert FROM public.{FRESHNESS_TABLE}")
+        if df is not None:
+            self.fetched = {(ticker, dataset): pd.Timestamp(date).date()
+                            for ticker, dataset, date in df.itertuples(index=False)}
+        return self
+
+    def is_due(self, ticker, dataset):
+        fetched = self.fetched.get((ticker, dataset))
+        return fetched is None or (self.today - fetched).days >= self.ttl_days.get(dataset, 0)
+
+    def plan(self, tickers, datasets):
+        """
+        :return: Dict of ticker -> datasets due for it; tickers with nothing due are left out.
+        """
+        tickers = list(dict.fromkeys(ticker.strip() for ticker in tickers))
+        plan = {}
+        for ticker in tickers:
+            due = [dataset for dataset in datasets if self.is_due(ticker, dataset)]
+            if due:
+                plan[ticker] = due
+        skipped = len(tickers) * len(datasets) - sum(len(due) for due in plan.values())
+        self.logger.info(f"Freshness: {skipped} of {len(tickers) * len(datasets)} ticker datasets still fresh")
+        return plan
+
+    def to_frame(self, entries):
+        """
+        Registry rows marking (ticker, dataset) entries as fetched today.
+        """
+        return pd.DataFrame([{'ticker': ticker, 'dataset': dataset, 'date_insert': self.today.strftime('%Y-%m-%d')}
+                             for ticker, dataset in entries])
@@ -0,0 +1,378 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+import aiohttp
+import requests
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import brotli  # noqa: F401  requests/urllib3 only decode br when a brotli module is importable
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds, upper bounds; the last bucket is +inf
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_default_client = None
+_default_client_lock = threading.Lock()
+_fixture_store = None
+_fixture_store_lock = threading.Lock()
+
+# Form fields left out of fixture keys: credentials and per-session tokens differ between recording and replay
+FIXTURE_IGNORED_FIELDS = {'Email', 'Password', '__RequestVerificationToken'}
+
+
+class HostMetrics:
+    """
+    Request counters and a latency histogram for one host, shared by every client in the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latency_seconds = 0.0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, latency, size=0, error=False):
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+            self.latency_seconds += latency
+            self.latency_histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            if error:
+                self.errors += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f'<={bound}s' for bound in LATENCY_BUCKETS] + [f'>{LATENCY_BUCKETS[-1]}s']
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retries,
+                'bytes': self.bytes,
+                'avg_latency_seconds': self.latency_seconds / self.requests if self.requests else 0.0,
+                'latency_histogram': dict(zip(labels, self.latency_histogram)),
+            }
+
+
+def get_host_metrics(host):
+    with _metrics_lock:
+        metrics = _metrics.get(host)
+        if metrics is None:
+            metrics = HostMetrics()
+            _metrics[host] = metrics
+        return metrics
+
+
+def get_http_metrics():
+    """
+    Per-host request metrics of every client in the process.
+    """
+    with _metrics_lock:
+        hosts = dict(_metrics)
+    return {host: metrics.snapshot() for host, metrics in hosts.items()}
+
+
+def backoff_delay(attempt, backoff_factor, backoff_max, retry_after=None):
+    """
+    Exponential backoff with full jitter. A numeric Retry-After header from the server wins.
+    """
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), backoff_max)
+        except ValueError:
+            pass
+    return random.uniform(0, min(backoff_max, backoff_factor * 2 ** attempt))
+
+
+class FixtureNotFound(LookupError):
+    pass
+
+
+class FixtureStore:
+    """
+    Record/replay store of HTTP responses. In 'record' mode every final response is saved as it goes
+    by; in 'replay' mode requests never reach the network and are answered from the store, so scrapers
+    run offline and deterministically. Fixtures are keyed by method, URL and form body.
+    """
+
+    def __init__(self, directory, mode):
+        """
+        :param mode: 'record' or 'replay'.
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown fixture mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.stats = {'recorded': 0, 'replayed': 0, 'missing': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(method, url, data=None):
+        fields = sorted((k, str(v)) for k, v in (data or {}).items() if k not in FIXTURE_IGNORED_FIELDS)
+        return hashlib.sha256(json.dumps([method.upper(), url, fields]).encode()).hexdigest()
+
+    def save(self, method, url, data, status, headers, content):
+        path = os.path.join(self.directory, self.key(method, url, data))
+        meta = {'method': method.upper(), 'url': url, 'status': status,
+                'content_type': headers.get('Content-Type')}
+        with gzip.open(f'{path}.body.gz', 'wb') as f:
+            f.write(content)
+        with open(f'{path}.json', 'w') as f:
+            json.dump(meta, f, indent=4)
+        with self._lock:
+            self.stats['recorded'] += 1
+
+    def load(self, method, url, data=None):
+        """
+        :return: Tuple of (metadata dict, body bytes). Raises FixtureNotFound when nothing was recorded.
+        """
+        path = os.path.join(self.directory, self.key(method, url, data))
+        try:
+            with open(f'{path}.json', 'r') as f:
+                meta = json.load(f)
+            with gzip.open(f'{path}.body.gz', 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.stats['missing'] += 1
+            raise FixtureNotFound(f"No fixture recorded for {method.upper()} {url}")
+        with self._lock:
+            self.stats['replayed'] += 1
+        return meta, content
+
+    def replay_response(self, method, url, data=None):
+        meta, content = self.load(method, url, data)
+        response = requests.Response()
+        response.status_code = meta['status']
+        response.url = url
+        response._content = content
+        response.headers = CaseInsensitiveDict({'Content-Type': meta['content_type']} if meta['content_type'] else {})
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+
+def get_fixture_store():
+    """
+    Fixture store configured through HTTP_FIXTURE_MODE (record/replay) and HTTP_FIXTURE_DIR, or None
+    when fixtures are disabled.
+    """
+    global _fixture_store
+    mode = os.getenv('HTTP_FIXTURE_MODE')
+    if not mode:
+        return None
+    with _fixture_store_lock:
+        if _fixture_store is None or _fixture_store.mode != mode:
+            _fixture_store = FixtureStore(os.getenv('HTTP_FIXTURE_DIR', './data/fixtures/http'), mode)
+        return _fixture_store
+
+
+class HttpClient:
+    """
+    Blocking HTTP client shared by the scrapers. Keeps one keep-alive session per host, negotiates
+    compression, applies connect/read timeouts and retries 429/5xx and connection errors with backoff.
+    Cookies live on the per-host session, so a client that logs in should not be shared.
+    """
+
+    def __init__(self, headers=None, timeout=(5, 30), max_retries=3, backoff_factor=0.5, backoff_max=30,
+                 pool_maxsize=10, rate_limiter=None, fixture_store=None, logger=None):
+        """
+        :param headers: Default headers of every request.
+        :param timeout: (connect, read) timeout in seconds.
+        :param max_retries: Retries after the first attempt on retryable failures.
+        :param pool_maxsize: Keep-alive connections kept per host.
+        :param rate_limiter: Optional TokenBucket every attempt has to acquire from.
+        :param fixture_store: FixtureStore to record to or replay from (defaults to get_fixture_store()).
+        """
+        self.headers = {'Accept-Encoding': ACCEPT_ENCODING, **(headers or {})}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.fixture_store = fixture_store or get_fixture_store()
+        self.rate_limiter = rate_limiter
+        self.logger = logger or logging.getLogger(__name__)
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def _get_session(self, host):
+        with self._sessions_lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(self.headers)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request, retrying retryable failures. Returns the final Response (which may still be an
+        error status once retries are exhausted) and raises the last RequestException if none succeeded.
+        """
+        if self.fixture_store is not None and self.fixture_store.mode == 'replay':
+            return self.fixture_store.replay_response(method, url, kwargs.get('data'))
+
+        response = self._send(method, url, **kwargs)
+        if self.fixture_store is not None:
+            self.fixture_store.save(method, url, kwargs.get('data'), response.status_code, response.headers, response.content)
+        return response
+
+    def _send(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        session = self._get_session(host)
+        metrics = get_host_metrics(host)
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start_time = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.record(time.perf_counter() - start_time, error=True)
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_factor, self.backoff_max)
+                self.logger.warning(f"{method} {url} failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                retryable = response.status_code in RETRY_STATUSES
+                metrics.record(time.perf_counter() - start_time, len(response.content), error=response.status_code >= 400)
+                if not retryable or attempt == self.max_retries:
+                    return response
+                delay = backoff_delay(attempt, self.backoff_factor, self.backoff_max, response.headers.get('Retry-After'))
+                self.logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            metrics.record_retry()
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def cookies(self, url):
+        """
+        Cookie jar of the session serving url's host, e.g. to persist or restore a login.
+        """
+        return self._get_session(urlsplit(url).netloc).cookies
+
+    def close(self):
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class AsyncHttpClient:
+    """
+    asyncio counterpart of HttpClient on one aiohttp session, with the same retry policy and metrics.
+    Use it as an async context manager.
+    """
+
+    def __init__(self, headers=None, timeout=30, max_retries=3, backoff_factor=0.5, backoff_max=30,
+                 limit_per_host=10, rate_limiter=None, fixture_store=None, logger=None):
+        """
+        :param timeout: Total timeout of one attempt in seconds.
+        :param limit_per_host: Concurrent connections kept per host.
+        :param rate_limiter: Optional TokenBucket every attempt has to acquire from.
+        """
+        self.headers = {'Accept-Encoding': ACCEPT_ENCODING, **(headers or {})}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.limit_per_host = limit_per_host
+        self.rate_limiter = rate_limiter
+        self.fixture_store = fixture_store or get_fixture_store()
+        self.logger = logger or logging.getLogger(__name__)
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+
+    async def get(self, url, **kwargs):
+        """
+        GET url and return its body, retrying retryable failures. Raises aiohttp.ClientResponseError
+        for an error status and the last connection/timeout error once retries are exhausted.
+        """
+        if self.fixture_store is not None and self.fixture_store.mode == 'replay':
+            meta, content = self.fixture_store.load('GET', url)
+            if meta['status'] >= 400:
+                request_info = aiohttp.RequestInfo(URL(url), 'GET', CIMultiDictProxy(CIMultiDict()), URL(url))
+                raise aiohttp.ClientResponseError(request_info, (), status=meta['status'], message='replayed fixture')
+            return content
+
+        host = urlsplit(url).netloc
+        metrics = get_host_metrics(host)
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            start_time = time.perf_counter()
+            try:
+                async with self.session.get(url, **kwargs) as response:
+                    content = await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                metrics.record(time.perf_counter() - start_time, error=True)
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_factor, self.backoff_max)
+                self.logger.warning(f"GET {url} failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                metrics.record(time.perf_counter() - start_time, len(content), error=response.status >= 400)
+                if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                    if self.fixture_store is not None:
+                        self.fixture_store.save('GET', url, None, response.status, response.headers, content)
+                    response.raise_for_status()
+                    return content
+                delay = backoff_delay(attempt, self.backoff_factor, self.backoff_max, response.headers.get('Retry-After'))
+                self.logger.warning(f"GET {url} returned {response.status}, retrying in {delay:.1f}s")
+            metrics.record_retry()
+            await asyncio.sleep(delay)
+
+
+def get_http_client():
+    """
+    Return the process-wide HttpClient for anonymous scraping, creating it on first use.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
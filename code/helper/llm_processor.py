@@ -1,12 +1,13 @@
 import logging
 import datetime
 import json
-from groq import Groq
+from groq import Groq, AsyncGroq
 
 class LLMProcessor:
     def __init__(self, api_key, model):
         api_key = api_key
         self.client = Groq(api_key=api_key)
+        self.async_client = AsyncGroq(api_key=api_key)
         self.today = datetime.datetime.today().strftime('%Y-%m-%d')
         self.model = model
 
@@ -42,10 +43,8 @@ class LLMProcessor:
         )
         return chat_completion
 
-    def chat_generate_with_tool(self, prompt_object, tool_function):
-        prompt_object[0]['content'] = self.get_system_tool()
-        messages= prompt_object.copy()
-        tools = [
+    def get_sql_tools(self):
+        return [
             {
                 "type": "function",
                 "function": {
@@ -64,6 +63,23 @@ class LLMProcessor:
                 },
             }
         ]
+
+    def get_summarize_message(self, function_response):
+        return [
+                {
+                    "role": "system",
+                    "content": "Your are a helpful assistance. Your task is to summarize the query result from user. Only summarize the data provide by the user. Please provide a brief explanation of the data and it result"
+                },
+                {
+                    "role": "user",
+                    "content":function_response,
+                }
+            ]
+
+    def chat_generate_with_tool(self, prompt_object, tool_function):
+        prompt_object[0]['content'] = self.get_system_tool()
+        messages= prompt_object.copy()
+        tools = self.get_sql_tools()
         response =  self.chat_generate_open_ai(prompt_object=messages, 
                                                tools=tools, 
                                                model='llama3-groq-70b-8192-tool-use-preview'
@@ -84,20 +100,49 @@ class LLMProcessor:
                     sql_query=function_args.get("sql_query")
                 )
             
-                summerize_meesage=[
-                        {
-                            "role": "system",
-                            "content": "Your are a helpful assistance. Your task is to summarize the query result from user. Only summarize the data provide by the user. Please provide a brief explanation of the data and it result"
-                        },
-                        {
-                            "role": "user",
-                            "content":function_response,
-                        }
-                    ]
+                summerize_meesage = self.get_summarize_message(function_response)
             second_response = self.chat_generate_open_ai(prompt_object=summerize_meesage, model=self.model)    
             return second_response
-    
-        
+
+    async def chat_generate_open_ai_async(self, prompt_object: list, model: str = None, tools: list = None):
+        model = model or self.model
+        chat_completion = await self.async_client.chat.completions.create(
+            messages=prompt_object,
+            model=model,
+            temperature=0.5,
+            top_p=1,
+            stop=None,
+            stream=False,
+            tool_choice='auto',
+            tools=tools,
+        )
+        return chat_completion
+
+    async def chat_generate_with_tool_async(self, prompt_object, tool_function):
+        """
+        Event-loop version of chat_generate_with_tool; tool_function must be a coroutine function.
+        """
+        prompt_object[0]['content'] = self.get_system_tool()
+        messages = prompt_object.copy()
+        response = await self.chat_generate_open_ai_async(prompt_object=messages,
+                                                          tools=self.get_sql_tools(),
+                                                          model='llama3-groq-70b-8192-tool-use-preview'
+                                                          )
+        tool_calls = response.choices[0].message.tool_calls
+        if tool_calls:
+            available_functions = {
+                "sql_query_executor": tool_function,
+            }
+            for tool_call in tool_calls:
+                self.logger.info(f'Query generate : {tool_call.function.arguments}')
+                function_to_call = available_functions[tool_call.function.name]
+                function_args = json.loads(tool_call.function.arguments)
+                function_response = await function_to_call(
+                    sql_query=function_args.get("sql_query")
+                )
+                summerize_meesage = self.get_summarize_message(function_response)
+            return await self.chat_generate_open_ai_async(prompt_object=summerize_meesage, model=self.model)
+
     def process_query(self,system_prompt, prompt):
         chat_completion = self.chat_generate(system_prompt, prompt)
         return chat_completion.choices[0].message.content
@@ -493,7 +538,7 @@ class LLMProcessor:
         "dividends_payable": "float8" NULLABLE | Dividends payable of the stock example 1000000 
         "treasury_stock": "float8" NULLABLE | Treasury stock of the company example 1000000
         "interest_payable": "float8" NULLABLE | Interest payable of the stock example 1000000
-        "date_insert": "varchar" NULLABLE | Insert date of the data format YYYY-MM-DD example 2024-07-14
+        "date_insert": "date" NULLABLE | Insert date of the data format YYYY-MM-DD example 2024-07-14
 
         Table Name : public.yahoofinance_cash_flow
         Table Schema:
@@ -511,7 +556,7 @@ class LLMProcessor:
         "net_income_from_continuing_operations": "float8" NULLABLE |  Net income from continuing operations example 1000000
         "investing_cash_flow": "float8" NULLABLE | Cash flow from investing activities example 1000000
         "financing_cash_flow": "float8" NULLABLE | Cash flow from financing activities example 1000000
-        "date_insert": "varchar" NULLABLE | Insert date of the data format YYYY-MM-DD example 2024-07-14
+        "date_insert": "date" NULLABLE | Insert date of the data format YYYY-MM-DD example 2024-07-14
 
         Table Name : public.yahoofinance_income_statement
         Table Schema:
@@ -533,7 +578,17 @@ class LLMProcessor:
         "pretax_income": "float8" NULLABLE | Pretax income example 1000000
         "net_income_continuous_operations": "float8" NULLABLE | Net income from continuous operations example 1000000
         "operating_expense": "float8" NULLABLE | Operating expenses example 1000000
-        "date_insert": "varchar" NULLABLE | Insert date of the data format YYYY-MM-DD example 2024-07-14
+        "date_insert": "date" NULLABLE | Insert date of the data format YYYY-MM-DD example 2024-07-14
+
+        Below are precomputed materialized views holding the latest screener snapshot, prefer them for insider, 13F and screener questions:
+        View Name : public.mv_insider_buying_activity | ticker, relationship, amount, count, trans_date, date_insert
+        View Name : public.mv_insider_buying_activity_with_superinvestor | ticker, count, total_amount, date_insert
+        View Name : public.mv_custom_insider | ticker, date_filling, total_value, date_insert
+        View Name : public.mv_screen_bigbet | ticker, percent_owned, count, date_insert
+        View Name : public.mv_52week_lows | ticker, percent_owned, date_insert
+        View Name : public.mv_13f_filing | ticker, fund_name, round (percentage of the fund portfolio), latest 13F filing of each fund, has no date_insert
+        View Name : public.mv_custom_screen | screen_name (Finviz screen, main screen is 'custom_screen'), ticker, sector, industry, market_cap, pe, date_insert
+        View Name : public.mv_screen_magic | variant (Magic Formula screen, e.g. 'cap_50_top_50' = minimum market cap $50M, top 50), ticker, market_cap, date_insert
 
         Instruction steps:
         1. Identify the user's question and what they want to know.
@@ -546,10 +601,11 @@ class LLMProcessor:
         - Use PostgreSQL-specific functions when they can improve the query or analysis.
         - Current date is {current_date}
         - Do not add any explanation or instroduction in your answer
-        - Alway add date_insert = current day in your query
+        - Alway add date_insert = current day in your query, except for the yahoofinance tables: they are only refreshed when their data is stale, so use the latest snapshot of the symbol instead example date_insert = (SELECT max(date_insert) FROM public.yahoofinance_cash_flow WHERE symbol = 'AAPL')
         - Alway limit your respond to 100 row
         - Do not use * in your query always define the column name to query
-        - For any date column use in where clause cast them to date first example cast(date as date)
+        - date_insert is already a date column, compare it directly example date_insert = CURRENT_DATE
+        - For any other date column use in where clause cast them to date first example cast(date as date)
         - If ask to find data relate to date alway use BETWEEN to query the date example WHERE date between '2023-01-01' to '2023-12-31
         - If there are no data return respond with "No data available for the symbol"
         '''
\ No newline at end of file
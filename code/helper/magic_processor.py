@@ -1,21 +1,37 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from helper.http_client import HttpClient
+
+SESSION_PATH = './data/cache/magic/session.json'
+SESSION_MAX_AGE = 12 * 60 * 60  # seconds; forms-auth cookies are mostly session cookies without an expiry
 
 class MagicFormulaInvesting:
-    def __init__(self, email, password):
+    def __init__(self, email, password, http_client=None, session_path=SESSION_PATH, max_workers=4):
+        """
+        :param session_path: File the login cookies and verification token are persisted to, None to
+                             log in on every run.
+        :param max_workers: Screen variants fetched concurrently on the logged-in session.
+        """
         self.login_url = "https://www.magicformulainvesting.com/Account/LogOn"
         self.screening_url = "https://www.magicformulainvesting.com/Screening/StockScreening"
         self.credentials = {
             'Email': email,
             'Password': password
         }
-        self.session = requests.Session()
+        # Own client rather than the shared one: the per-host session carries the login cookies
+        self.http = http_client or HttpClient()
+        self.session_path = session_path
+        self.max_workers = max_workers
+        self.logged_in = False
 
     def login(self):
         # Get the login page to retrieve the token
-        login_page = self.session.get(self.login_url)
+        login_page = self.http.get(self.login_url)
         soup = BeautifulSoup(login_page.text, 'html.parser')
 
         # Find the __RequestVerificationToken value
@@ -25,20 +41,115 @@ class MagicFormulaInvesting:
         self.credentials['__RequestVerificationToken'] = token
 
         # Perform the login
-        response = self.session.post(self.login_url, data=self.credentials)
+        response = self.http.post(self.login_url, data=self.credentials)
 
         # Check if login was successful
         if "Logout" in response.text:
             print("Login successful!")
+            self.logged_in = True
+            self.save_session()
             return True
         else:
             print("Login failed!")
             return False
 
+    def ensure_login(self):
+        """
+        Reuse the persisted session when it is still valid, log in otherwise.
+        """
+        if self.logged_in or self.load_session():
+            return True
+        return self.login()
+
+    def load_session(self):
+        if not self.session_path or not os.path.exists(self.session_path):
+            return False
+        try:
+            with open(self.session_path, 'r') as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        now = time.time()
+        if session.get('email') != self.credentials['Email'] or now - session.get('saved_at', 0) > SESSION_MAX_AGE:
+            return False
+        if any(cookie['expires'] is not None and cookie['expires'] <= now for cookie in session['cookies']):
+            return False
+
+        jar = self.http.cookies(self.login_url)
+        for cookie in session['cookies']:
+            jar.set(cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie['path'],
+                    expires=cookie['expires'], secure=cookie['secure'])
+        self.credentials['__RequestVerificationToken'] = session['token']
+        self.logged_in = True
+        print("Reusing saved Magic Formula session")
+        return True
+
+    def save_session(self):
+        if not self.session_path:
+            return
+        session = {
+            'email': self.credentials['Email'],
+            'token': self.credentials['__RequestVerificationToken'],
+            'saved_at': time.time(),
+            'cookies': [{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path,
+                         'expires': cookie.expires, 'secure': cookie.secure}
+                        for cookie in self.http.cookies(self.login_url)],
+        }
+        os.makedirs(os.path.dirname(self.session_path), exist_ok=True)
+        # The file holds live auth cookies: write it owner-only and swap it in atomically
+        tmp_path = f'{self.session_path}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(session, f)
+        os.replace(tmp_path, self.session_path)
+
+    def clear_session(self):
+        self.logged_in = False
+        self.http.cookies(self.login_url).clear()
+        if self.session_path and os.path.exists(self.session_path):
+            os.remove(self.session_path)
+
     def get_stock_screening(self, minimum_market_cap='50', select_30=False):
-        if not self.login():
+        return self.get_stock_screenings([{'minimum_market_cap': minimum_market_cap, 'select_30': select_30}])
+
+    def get_stock_screenings(self, variants):
+        """
+        Fetch several screen variants concurrently on one logged-in session. A response that comes back
+        logged out means the saved session expired server-side: log in once and refetch those variants.
+        :param variants: List of dicts with minimum_market_cap and select_30.
+        :return: One DataFrame with a row per variant and ticker; `variant` names the screen (see variant_name),
+                 so a ticker picked by several variants appears once for each.
+        """
+        if not self.ensure_login():
             return None
 
+        responses = self._post_screenings(variants)
+        expired = [i for i, response in enumerate(responses) if "Logout" not in response.text]
+        if expired:
+            print("Saved session expired, logging in again")
+            self.clear_session()
+            if not self.login():
+                return None
+            for i, response in zip(expired, self._post_screenings([variants[i] for i in expired])):
+                responses[i] = response
+
+        frames = [self.parse_screening(response.text).assign(variant=self.variant_name(**variant))
+                  for variant, response in zip(variants, responses)]
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=['variant', 'ticker'], keep='first')
+        df['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def variant_name(minimum_market_cap='50', select_30=False):
+        # e.g. 'cap_50_top_50': minimum market cap in $M and the number of stocks selected
+        return f"cap_{minimum_market_cap}_top_{30 if select_30 else 50}"
+
+    def _post_screenings(self, variants):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda variant: self._post_screening(**variant), variants))
+
+    def _post_screening(self, minimum_market_cap='50', select_30=False):
         # Prepare the form data for screening stocks
         screening_data = {
             '__RequestVerificationToken': self.credentials['__RequestVerificationToken'],
@@ -47,8 +158,10 @@ class MagicFormulaInvesting:
         }
 
         # Submit the form to get the stock screening results
-        screening_response = self.session.post(self.screening_url, data=screening_data)
-        soup = BeautifulSoup(screening_response.text, 'html.parser')
+        return self.http.post(self.screening_url, data=screening_data)
+
+    def parse_screening(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
 
         # Find the table with stock data
         table = soup.findAll('tbody')[1].find_all('tr')
@@ -61,8 +174,7 @@ class MagicFormulaInvesting:
                 'ticker': columns[1].text.strip(),
                 'market_cap': columns[2].text.strip()
             })
-        
-        df = pd.DataFrame(table_list)
-        df['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
 
+        df = pd.DataFrame(table_list, columns=['company', 'ticker', 'market_cap'])
+        df['market_cap'] = pd.to_numeric(df['market_cap'].str.replace(',', ''), errors='coerce')
         return df
@@ -0,0 +1,333 @@
+import datetime
+import json
+import time
+from sqlalchemy import text
+
+
+class MigrationProcessor:
+    """
+    Apply the versioned schema migrations declared in data/MIGRATIONS.json.
+
+    Applied versions are recorded in schema_migrations. Column conversions are done by adding a typed
+    shadow column, backfilling it in id-range batches and swapping it in, with the last backfilled id
+    stored in schema_migration_progress after every batch, so an interrupted run resumes where it stopped
+    instead of rewriting a large table under one long lock. Data fixes on large tables use batched_sql
+    steps, which run their query over the same id-range batches.
+    """
+
+    def __init__(self, engine, logger, batch_size=50000):
+        self.engine = engine
+        self.logger = logger
+        self.batch_size = batch_size
+
+    def load_migrations(self, file_path):
+        with open(file_path, 'r') as f:
+            migrations = json.load(f)
+        return sorted(migrations, key=lambda migration: migration['version'])
+
+    def run(self, migrations):
+        self._create_tracking_tables()
+        applied = self._get_applied_versions()
+
+        for migration in migrations:
+            version = migration['version']
+            if version in applied:
+                continue
+
+            self.logger.info(f"Applying migration {version}: {migration['name']}")
+            start_time = time.time()
+            for step_number, step in enumerate(migration['steps']):
+                if self._is_step_done(version, step_number):
+                    continue
+                self._run_step(version, step_number, step)
+                self._mark_step_done(version, step_number)
+
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                    {'version': version, 'name': migration['name']}
+                )
+            self.logger.info(f"Migration {version} applied in {time.time() - start_time:.2f} seconds")
+
+    def _create_tracking_tables(self):
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version int4 NOT NULL PRIMARY KEY, name varchar NOT NULL, "
+                "applied_at timestamptz NOT NULL DEFAULT now())"
+            ))
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migration_progress ("
+                "version int4 NOT NULL, step int4 NOT NULL, last_id int8 NOT NULL DEFAULT 0, "
+                "done bool NOT NULL DEFAULT false, PRIMARY KEY (version, step))"
+            ))
+
+    def _get_applied_versions(self):
+        with self.engine.connect() as conn:
+            return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    def _get_progress(self, version, step_number):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT last_id, done FROM schema_migration_progress WHERE version = :version AND step = :step"),
+                {'version': version, 'step': step_number}
+            ).first()
+        return (row[0], row[1]) if row else (0, False)
+
+    def _is_step_done(self, version, step_number):
+        return self._get_progress(version, step_number)[1]
+
+    def _save_progress(self, conn, version, step_number, last_id, done=False):
+        conn.execute(
+            text(
+                "INSERT INTO schema_migration_progress (version, step, last_id, done) "
+                "VALUES (:version, :step, :last_id, :done) "
+                "ON CONFLICT (version, step) DO UPDATE SET last_id = EXCLUDED.last_id, done = EXCLUDED.done"
+            ),
+            {'version': version, 'step': step_number, 'last_id': last_id, 'done': done}
+        )
+
+    def _mark_step_done(self, version, step_number):
+        last_id, _ = self._get_progress(version, step_number)
+        with self.engine.begin() as conn:
+            self._save_progress(conn, version, step_number, last_id, done=True)
+
+    def _run_step(self, version, step_number, step):
+        step_type = step['type']
+        if step_type == 'convert_column':
+            self._convert_column(version, step_number, step)
+        elif step_type == 'create_index':
+            self._create_index(step)
+        elif step_type == 'partition_table':
+            self._partition_table(version, step_number, step)
+        elif step_type == 'batched_sql':
+            self._batched_sql(version, step_number, step)
+        elif step_type == 'sql':
+            with self.engine.begin() as conn:
+                conn.execute(text(step['query']))
+        else:
+            raise ValueError(f"Unknown migration step type: {step_type}")
+
+    def _get_column_type(self, table_name, column_name):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(
+                    "SELECT data_type FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+                ),
+                {'table': table_name, 'column': column_name}
+            ).scalar()
+
+    def _convert_column(self, version, step_number, step):
+        """
+        Convert a column in place: add "<column>__new" with the target type, backfill it batch by batch
+        using the step's `using` expression (where {column} is the old value cast to text), then drop the
+        old column and rename the new one.
+        """
+        table_name = step['table']
+        column_name = step['column']
+        target_type = step['to']
+        shadow_name = f'{column_name}__new'
+
+        current_type = self._get_column_type(table_name, column_name)
+        if current_type is None:
+            self.logger.info(f"Skipping {table_name}.{column_name}: column does not exist")
+            return
+        if current_type == step.get('type_name', target_type):
+            self.logger.info(f"Skipping {table_name}.{column_name}: already {target_type}")
+            return
+
+        using = step['using'].replace('{column}', f'"{column_name}"::text')
+        with self.engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN IF NOT EXISTS "{shadow_name}" {target_type}'))
+            max_id = conn.execute(text(f'SELECT coalesce(max(id), 0) FROM "{table_name}"')).scalar()
+
+        last_id, _ = self._get_progress(version, step_number)
+        while last_id < max_id:
+            upper_id = last_id + self.batch_size
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(f'UPDATE "{table_name}" SET "{shadow_name}" = {using} WHERE id > :lower AND id <= :upper'),
+                    {'lower': last_id, 'upper': upper_id}
+                )
+                self._save_progress(conn, version, step_number, upper_id)
+            last_id = upper_id
+            self.logger.info(f"Backfilled {table_name}.{column_name} up to id {min(last_id, max_id)} of {max_id}")
+
+        # Rows appended while the backfill ran are converted under the same lock as the swap
+        with self.engine.begin() as conn:
+            conn.execute(text(f'LOCK TABLE "{table_name}" IN ACCESS EXCLUSIVE MODE'))
+            conn.execute(
+                text(f'UPDATE "{table_name}" SET "{shadow_name}" = {using} WHERE id > :lower'),
+                {'lower': last_id}
+            )
+            conn.execute(text(f'ALTER TABLE "{table_name}" DROP COLUMN "{column_name}"'))
+            conn.execute(text(f'ALTER TABLE "{table_name}" RENAME COLUMN "{shadow_name}" TO "{column_name}"'))
+        self.logger.info(f"Converted {table_name}.{column_name} from {current_type} to {target_type}")
+
+    def _batched_sql(self, version, step_number, step):
+        """
+        Run a data fix over a large table in id-range batches, one transaction per batch, resuming from
+        the last finished batch like _convert_column. The query selects its batch with :lower and :upper
+        (id > :lower AND id <= :upper). Rows added after the step started are written by code that
+        already produces the fixed form, so they are not revisited.
+        """
+        table_name = step['table']
+        with self.engine.connect() as conn:
+            if conn.execute(text("SELECT to_regclass(:table) IS NULL"), {'table': table_name}).scalar():
+                self.logger.info(f"Skipping batched step on {table_name}: table does not exist")
+                return
+            max_id = conn.execute(text(f'SELECT coalesce(max(id), 0) FROM "{table_name}"')).scalar()
+
+        last_id, _ = self._get_progress(version, step_number)
+        while last_id < max_id:
+            upper_id = last_id + self.batch_size
+            with self.engine.begin() as conn:
+                rows = conn.execute(text(step['query']), {'lower': last_id, 'upper': upper_id}).rowcount
+                self._save_progress(conn, version, step_number, upper_id)
+            last_id = upper_id
+            self.logger.info(f"Batched step on {table_name}: {rows} rows up to id {min(last_id, max_id)} of {max_id}")
+
+    def _create_index(self, step):
+        """
+        Build an index with CREATE INDEX CONCURRENTLY so ingestion keeps writing. An invalid index left by
+        an interrupted build is dropped and rebuilt. Expression indexes list SQL in `expressions` instead of
+        `columns` and need an explicit `name`.
+        """
+        table_name = step['table']
+        if 'expressions' in step:
+            index_name = step['name']
+            column_list = ', '.join(step['expressions'])
+        else:
+            columns = step['columns']
+            index_name = step.get('name', f"{table_name}_{'_'.join(columns)}_idx")
+            column_list = ', '.join(f'"{col}"' for col in columns)
+
+        with self.engine.connect() as conn:
+            table_exists = conn.execute(
+                text("SELECT to_regclass(:table) IS NOT NULL"), {'table': table_name}
+            ).scalar()
+            if not table_exists:
+                self.logger.info(f"Skipping index {index_name}: table {table_name} does not exist")
+                return
+            is_partitioned = self._is_partitioned(conn, table_name)
+            is_valid = conn.execute(
+                text(
+                    "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name"
+                ),
+                {'name': index_name}
+            ).scalar()
+
+        # Partitioned parents do not support CONCURRENTLY; the index is built per partition instead
+        concurrently = '' if is_partitioned else 'CONCURRENTLY '
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            if is_valid is False:
+                conn.execute(text(f'DROP INDEX {concurrently}IF EXISTS "{index_name}"'))
+            conn.execute(text(f'CREATE INDEX {concurrently}IF NOT EXISTS "{index_name}" ON "{table_name}" ({column_list})'))
+        self.logger.info(f"Index {index_name} ready on {table_name} ({column_list})")
+
+    def _is_partitioned(self, conn, table_name):
+        return conn.execute(
+            text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {'table': table_name}
+        ).scalar() is True
+
+    def _partition_table(self, version, step_number, step):
+        """
+        Rebuild a plain table as a table partitioned by month on `column`: create "<table>__partitioned"
+        with one partition per month already present, copy rows over in id batches (resumable like
+        _convert_column), then swap the tables under a short lock. Rows without a value in `column`
+        are filed under 1970-01 so the retention policy prunes them.
+        """
+        table_name = step['table']
+        column_name = step['column']
+        new_table = f'{table_name}__partitioned'
+
+        with self.engine.connect() as conn:
+            if conn.execute(text("SELECT to_regclass(:table) IS NULL"), {'table': table_name}).scalar():
+                self.logger.info(f"Skipping partitioning of {table_name}: table does not exist")
+                return
+            if self._is_partitioned(conn, table_name):
+                self.logger.info(f"Skipping partitioning of {table_name}: already partitioned")
+                return
+
+        column_value = f"coalesce(\"{column_name}\", DATE '1970-01-01')"
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{new_table}" (LIKE "{table_name}" INCLUDING DEFAULTS) '
+                f'PARTITION BY RANGE ("{column_name}")'
+            ))
+            has_primary_key = conn.execute(text(
+                "SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:table) AND contype = 'p'"
+            ), {'table': new_table}).first() is not None
+            if not has_primary_key:
+                # A primary key on a partitioned table must contain the partition key
+                conn.execute(text(
+                    f'ALTER TABLE "{new_table}" ADD CONSTRAINT "{table_name}_part_pkey" PRIMARY KEY (id, "{column_name}")'
+                ))
+            months = conn.execute(text(
+                f'SELECT DISTINCT date_trunc(\'month\', {column_value})::date FROM "{table_name}" '
+                f'UNION SELECT date_trunc(\'month\', CURRENT_DATE)::date '
+                f'UNION SELECT (date_trunc(\'month\', CURRENT_DATE) + interval \'1 month\')::date'
+            )).scalars().all()
+            for month in months:
+                conn.execute(text(self.partition_ddl(new_table, month, parent_name=table_name)))
+            max_id = conn.execute(text(f'SELECT coalesce(max(id), 0) FROM "{table_name}"')).scalar()
+
+        columns = self._get_column_names(table_name)
+        select_list = ', '.join(column_value if col == column_name else f'"{col}"' for col in columns)
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        copy_query = (
+            f'INSERT INTO "{new_table}" ({column_list}) SELECT {select_list} FROM "{table_name}" '
+            f'WHERE id > :lower AND id <= :upper ON CONFLICT DO NOTHING'
+        )
+
+        last_id, _ = self._get_progress(version, step_number)
+        while last_id < max_id:
+            upper_id = last_id + self.batch_size
+            with self.engine.begin() as conn:
+                conn.execute(text(copy_query), {'lower': last_id, 'upper': upper_id})
+                self._save_progress(conn, version, step_number, upper_id)
+            last_id = upper_id
+            self.logger.info(f"Copied {table_name} into partitions up to id {min(last_id, max_id)} of {max_id}")
+
+        with self.engine.begin() as conn:
+            conn.execute(text(f'LOCK TABLE "{table_name}" IN ACCESS EXCLUSIVE MODE'))
+            tail_months = conn.execute(text(
+                f'SELECT DISTINCT date_trunc(\'month\', {column_value})::date FROM "{table_name}" WHERE id > :lower'
+            ), {'lower': last_id}).scalars().all()
+            for month in tail_months:
+                conn.execute(text(self.partition_ddl(new_table, month, parent_name=table_name)))
+            conn.execute(text(copy_query.replace('AND id <= :upper ', '')), {'lower': last_id})
+            # Keep the id sequence alive when the old table (its owner) is dropped
+            sequence_name = conn.execute(
+                text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table_name}
+            ).scalar()
+            if sequence_name:
+                conn.execute(text(f'ALTER SEQUENCE {sequence_name} OWNED BY "{new_table}".id'))
+            conn.execute(text(f'DROP TABLE "{table_name}"'))
+            conn.execute(text(f'ALTER TABLE "{new_table}" RENAME TO "{table_name}"'))
+        self.logger.info(f"Partitioned {table_name} by month on {column_name}")
+
+    def _get_column_names(self, table_name):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = :table ORDER BY ordinal_position"
+                ),
+                {'table': table_name}
+            ).scalars().all()
+
+    @staticmethod
+    def partition_ddl(table_name, month, parent_name=None):
+        """
+        DDL for the monthly partition of `table_name` holding `month` (a date on the first of the month).
+        Partitions are named after `parent_name` (defaults to the table) so they keep their names after a swap.
+        """
+        next_month = (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        partition_name = f"{parent_name or table_name}_p{month.strftime('%Y_%m')}"
+        return (
+            f'CREATE TABLE IF NOT EXISTS "{partition_name}" PARTITION OF "{table_name}" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
@@ -1,5 +1,6 @@
 import json
 import logging
+import datetime
 from typing import Dict
 import pandas as pd
 import os
@@ -9,6 +10,19 @@ from helper.finviz_processor import FinvizScraper
 from helper.magic_processor import MagicFormulaInvesting
 from helper.sql_processor import CloudSQLDatabase
 from helper.llm_processor import LLMProcessor
+from helper.engine_registry import get_pool_stats
+from helper.http_client import get_http_metrics
+
+# QUERY.json entries feeding the LLM reports
+LLM_QUERY_NAMES = [
+    'insider_buying_activity',
+    'insider_buying_activity_with_superinvestor',
+    'custom_insider',
+    '52week_lows',
+    '13f_filing',
+    'custom_screen',
+    'screen_magic',
+]
 
 class PipelineProcessor:
     def __init__(self, env_vars: Dict[str, str], logger):
@@ -36,32 +50,55 @@ class PipelineProcessor:
             self.logger.error(f"Invalid JSON in CIK list file: {file_path}")
             raise
 
-    def process_sec_data(self, cik_list: Dict) -> pd.DataFrame:
-        processor = SecProcessor(cik_list)
+    def process_sec_data(self, cik_list: Dict, quarters: int = 1, seen_accessions=None):
+        processor = SecProcessor(cik_list, quarters=quarters, seen_accessions=seen_accessions)
         df = processor.process_all_funds()
+        if df is None:
+            return pd.DataFrame(), pd.DataFrame(processor.filings)
         
         numeric_columns = ['value', 'voting_sole', 'voting_shared', 'voting_none', 'prn_amt']
         for col in numeric_columns:
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
         df = df.drop_duplicates()
-        return df
+        return df, pd.DataFrame(processor.filings)
+
+    def load_seen_accessions(self) -> set:
+        """
+        Accession numbers already ingested into sec_13f, so their documents are not fetched again.
+        """
+        if not self.sql_helper.table_exists('sec_13f_accession'):
+            return set()
+        df = self.sql_helper.fetch_data("SELECT accession_number FROM public.sec_13f_accession")
+        return set() if df is None else set(df['accession_number'])
 
     def insert_data_to_sql(self, df: pd.DataFrame, table_name: str) -> None:
         try:
             self.logger.info(f"Inserting data into SQL table {table_name}")
             self.sql_helper.create_table(table_name, df.dtypes)
-            self.sql_helper.insert_data(table_name, df)
+            # insert_data raises on a failed write; False means the table was never created
+            if not self.sql_helper.insert_data(table_name, df):
+                raise RuntimeError(f"table {table_name} does not exist")
         except Exception as e:
             self.logger.error(f"Error inserting data into SQL: {str(e)}")
             raise
 
-    def process_sec_pipeline(self):
+    def process_sec_pipeline(self, quarters: int = 1):
+        """
+        :param quarters: Most recent 13F-HR filings to ingest per fund; raise it to backfill history.
+        """
         try:
             cik_list = self.load_cik_list('./data/CIK_LIST.json')
-            df_sec = self.process_sec_data(cik_list)
+            seen_accessions = self.load_seen_accessions()
+            df_sec, df_filings = self.process_sec_data(cik_list, quarters, seen_accessions)
+            if df_sec.empty:
+                self.logger.info("No new 13F filings since the last run.")
+                return
             self.insert_data_to_sql(df_sec, 'sec_13f')
-            self.logger.info("SEC data processing and insertion completed successfully.")
+            # Only mark filings as seen once their rows are stored: a failed sec_13f write raised above
+            df_filings['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
+            self.insert_data_to_sql(df_filings, 'sec_13f_accession')
+            self.logger.info(f"SEC data processing and insertion completed successfully ({len(df_filings)} new filings).")
         except Exception as e:
             self.logger.error(f"An error occurred in SEC pipeline: {str(e)}")
 
@@ -90,16 +127,14 @@ class PipelineProcessor:
 
     def process_finviz_pipeline(self):
         try:
-            url = ('https://finviz.com/screener.ashx?v=151&f=cap_microover,fa_curratio_o2,'
-                   'fa_eps5years_o5,fa_opermargin_o10,fa_roe_pos,fa_sales5years_o5,geo_usa,'
-                   'sh_insiderown_o10,sh_insidertrans_neg,sh_outstanding_o1,sh_price_o4,'
-                   'ta_highlow52w_b30h&ft=4&o=change')
+            with open('./data/FINVIZ_SCREEN.json', 'r') as f:
+                screens = json.load(f)
             
-            scraper = FinvizScraper(url)
+            scraper = FinvizScraper(screens, logger=self.logger)
             scraper.fetch_data()
             
             self.insert_data_to_sql(scraper.df, 'finviz_screen')
-            self.logger.info("Finviz pipeline completed successfully")
+            self.logger.info(f"Finviz pipeline completed successfully ({len(screens)} screens)")
         except Exception as e:
             self.logger.error(f"An error occurred in Finviz pipeline: {str(e)}")
 
@@ -107,30 +142,38 @@ class PipelineProcessor:
         try:
             email = self.env_vars['MAGIC_USER']
             password = self.env_vars['MAGIC_PW']
+            with open('./data/MAGIC_SCREEN.json', 'r') as f:
+                variants = json.load(f)
+
             mfi = MagicFormulaInvesting(email, password)
-            stock_df = mfi.get_stock_screening()
+            stock_df = mfi.get_stock_screenings(variants)
             
             self.insert_data_to_sql(stock_df, 'magic_screen')
-            self.logger.info("Magic Formula pipeline completed successfully")
+            self.logger.info(f"Magic Formula pipeline completed successfully ({len(variants)} screens)")
         except Exception as e:
             self.logger.error(f"An error occurred in Magic Formula pipeline: {str(e)}")
 
+    def refresh_llm_views(self):
+        """
+        Rebuild the materialized views behind QUERY.json so the LLM pipeline reads precomputed results.
+        """
+        try:
+            with open('./data/MATVIEW.json', 'r') as f:
+                views = json.load(f)
+            self.sql_helper.refresh_materialized_views(views)
+        except Exception as e:
+            self.logger.error(f"An error occurred while refreshing materialized views: {str(e)}")
+
     def process_llm_pipeline(self):
         try:
             # Load query configurations
             with open('./data/QUERY.json', 'r') as f:
                 QUERY = json.load(f)
 
-            # Fetch data using SQL helper
-            data_frames = {
-                'insider_buying_activity': self.sql_helper.fetch_data(QUERY['insider_buying_activity']),
-                'insider_buying_activity_with_superinvestor': self.sql_helper.fetch_data(QUERY['insider_buying_activity_with_superinvestor']),
-                'custom_insider': self.sql_helper.fetch_data(QUERY['custom_insider']),
-                '52week_lows': self.sql_helper.fetch_data(QUERY['52week_lows']),
-                '13f_filing': self.sql_helper.fetch_data(QUERY['13f_filing']),
-                'custom_screen': self.sql_helper.fetch_data(QUERY['custom_screen']),
-                'screen_magic': self.sql_helper.fetch_data(QUERY['screen_magic'])
-            }
+            # Fetch data using SQL helper, all queries concurrently
+            data_frames = self.sql_helper.fetch_data_batch({
+                name: QUERY[name] for name in LLM_QUERY_NAMES
+            })
 
             # Process unique funds
             filing_13f = data_frames['13f_filing']
@@ -202,7 +245,11 @@ class PipelineProcessor:
             self.process_dataroma_pipeline()
             self.process_finviz_pipeline()
             self.process_magic_formula_pipeline()            
+            self.refresh_llm_views()
+            self.sql_helper.prune_partitions()
             self.logger.info("All pipelines completed successfully")
+            self.logger.info(f"Connection pool stats: {get_pool_stats()}")
+            self.logger.info(f"HTTP metrics: {get_http_metrics()}")
 
         except Exception as e:
             self.logger.error(f"An error occurred while running pipelines: {str(e)}")
@@ -225,6 +272,31 @@ class PipelineProcessor:
             return json.dumps({"error": "Invalid expression"})
 
 
+    async def sql_query_executor_async(self, sql_query):
+        """Accept PostgreSQL query and execute the query on the database without blocking the event loop"""
+        try:
+            columns, records = await self.sql_helper.fetch_records_async(sql_query)
+            result = [dict(zip(columns, record)) for record in records]
+            return json.dumps({"result": result}, default=str)
+        except Exception as e:
+            self.logger.error(f"Error while executing tool query: {e}")
+            return json.dumps({"error": "Invalid expression"})
+
+    async def route_prompt_async(self, prompt_object: list):
+        last_respond = prompt_object[-1]['content']
+        prompt_object_route=[
+            {"role": "system", "content": self.llm_helper.get_system_route()},
+            {"role": "user", "content": last_respond}
+            ]
+        route_result = await self.llm_helper.chat_generate_open_ai_async(prompt_object=prompt_object_route, model='llama3-70b-8192')
+
+        if route_result.choices[0].message.content == 'toolbot':
+            self.logger.info('Calling tool')
+            return await self.llm_helper.chat_generate_with_tool_async(prompt_object=prompt_object, tool_function=self.sql_query_executor_async)
+        else:
+            self.logger.info('Calling chat')
+            return await self.llm_helper.chat_generate_open_ai_async(prompt_object=prompt_object)
+
     def route_prompt(self, prompt_object: list):
 
         last_respond = prompt_object[-1]['content']
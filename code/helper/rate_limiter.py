@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every caller hitting one host. Tokens refill continuously at `rate` per
+    second up to `capacity`; each request takes one token, so the long-run request rate can never
+    exceed `rate` no matter how many threads or coroutines share the bucket.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: Sustained requests per second.
+        :param capacity: Largest burst allowed after an idle period (defaults to one second's worth).
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0}
+
+    def _reserve(self):
+        """
+        Take a token, going into debt if none is available, and return how long the caller must wait
+        before using it. Reserving under the lock keeps the order fair between waiters.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.stats['acquired'] += 1
+            if wait:
+                self.stats['waited'] += 1
+                self.stats['wait_seconds'] += wait
+            return wait
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def get_rate_limiter(host, rate):
+    """
+    Return the process-wide token bucket for a host, creating it on first use. The rate only applies
+    when the bucket is first created, so the first caller sets the host's ceiling.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = TokenBucket(rate)
+            _limiters[host] = limiter
+        return limiter
+
+
+def total_wait_seconds():
+    """
+    Seconds callers have been told to wait, summed over every host's bucket in the process.
+    """
+    with _limiters_lock:
+        return sum(limiter.stats['wait_seconds'] for limiter in _limiters.values())
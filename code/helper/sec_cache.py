@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+ACCESSION_PATTERN = re.compile(r'/Archives/edgar/data/\d+/(\d{18})/')
+
+
+class SecCache:
+    """
+    Gzip-compressed on-disk cache for SEC EDGAR responses.
+
+    Filing documents live under /Archives/ and never change once an accession is filed, so they are
+    kept until evicted. Anything else (the submissions JSON) is only served while younger than its TTL.
+    The cache is bounded by total compressed size; the least recently used files (by mtime, which is
+    refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, cache_dir='./data/cache/sec', max_bytes=512 * 1024 * 1024):
+        """
+        :param cache_dir: Root directory of the cache.
+        :param max_bytes: Upper bound of the compressed cache size before LRU eviction kicks in.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0, 'bytes_saved': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._scan())
+
+    def _path(self, url):
+        """
+        Filing documents are grouped by accession number so one filing's artifacts sit together.
+        """
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        match = ACCESSION_PATTERN.search(url)
+        folder = match.group(1) if match else 'submissions'
+        return os.path.join(self.cache_dir, folder, f'{digest}.gz')
+
+    @staticmethod
+    def is_immutable(url):
+        return ACCESSION_PATTERN.search(url) is not None
+
+    def get(self, url, ttl=None):
+        """
+        Return the cached body of url, or None on a miss.
+        :param ttl: Maximum age in seconds; ignored for immutable filing documents.
+        """
+        path = self._path(url)
+        immutable = self.is_immutable(url)
+        try:
+            if not immutable and ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+                with self._lock:
+                    self.stats['expired'] += 1
+                    self.stats['misses'] += 1
+                return None
+            with gzip.open(path, 'rb') as f:
+                content = f.read()
+        except (OSError, EOFError):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        if immutable:
+            # Touch to mark as recently used; mutable entries keep their mtime as the fetch time for the TTL
+            os.utime(path)
+        with self._lock:
+            self.stats['hits'] += 1
+            self.stats['bytes_saved'] += len(content)
+        return content
+
+    def put(self, url, content):
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                f.write(content)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._size += os.path.getsize(path) - old_size
+            self.stats['stores'] += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.gz'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        """
+        Remove least recently used files until the cache is back under 90% of max_bytes. Caller holds the lock.
+        """
+        target = self.max_bytes * 0.9
+        for path, _, size in sorted(self._scan(), key=lambda entry: entry[1]):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            self.stats['evictions'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+                'size_bytes': self._size,
+            }
@@ -1,14 +1,18 @@
-import requests
+import asyncio
+import aiohttp
 import pandas as pd
-from io import StringIO
+from io import BytesIO
+import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 import logging
 import numpy as np
 import time
-from requests.exceptions import RequestException
-from ratelimit import limits, sleep_and_retry
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import datetime
+import json
+from helper.sec_cache import SecCache
+from helper.rate_limiter import get_rate_limiter
+from helper.cusip_map import CusipMap, DEFAULT_PATH as CUSIP_MAP_PATH
+from helper.http_client import AsyncHttpClient, get_http_metrics
 
 pd.options.mode.chained_assignment = None
 
@@ -17,70 +21,121 @@ class SecProcessor:
     HEADERS = {
         "User-Agent": "Test Project (Test_Project@test.com)"
     }
-    RATE_LIMIT = 5  # requests per second
-    RATE_LIMIT_PERIOD = 1  # second
+    REQUESTS_PER_SECOND = 10  # SEC fair access policy, shared by data.sec.gov and www.sec.gov
+    REQUEST_TIMEOUT = 30  # seconds
+    SUBMISSIONS_TTL = 6 * 60 * 60  # seconds a cached submissions JSON is trusted
+    COLUMNS = ['name_of_issuer', 'title_of_class', 'cusip', 'figi', 'value', 'prn_amt', 'prn',
+               'put_call', 'discretion', 'manager', 'voting_sole', 'voting_shared', 'voting_none']
+    INT_COLUMNS = ['value', 'prn_amt', 'voting_sole', 'voting_shared', 'voting_none']
+    # Optional fields that are part of the sec_13f natural key; stored as '' rather than NULL because a
+    # NULL never matches in a unique index, which would turn every re-merge into an insert
+    KEY_TEXT_COLUMNS = ['title_of_class', 'put_call', 'discretion', 'manager']
 
-    def __init__(self, cik_list, max_workers=5):
+    def __init__(self, cik_list, max_workers=10, cache=None, requests_per_second=REQUESTS_PER_SECOND,
+                 quarters=1, seen_accessions=None, cusip_map=None):
+        """
+        :param max_workers: Maximum open connections to each SEC host.
+        :param cache: SecCache for downloaded documents (defaults to one under ./data/cache/sec).
+        :param requests_per_second: Ceiling on requests sent to SEC hosts, shared by every SecProcessor in the process.
+        :param quarters: Number of most recent 13F-HR filings to collect per fund (backfill depth).
+        :param seen_accessions: Accession numbers already ingested; their documents are never fetched.
+        :param cusip_map: CusipMap used to attach tickers (defaults to data/CUSIP_MAP.json in the repository).
+        """
         self.cik_list = cik_list
         self.max_workers = max_workers
         self.logger = self._setup_logger()
+        self.cache = cache or SecCache()
+        self.rate_limiter = get_rate_limiter('sec.gov', requests_per_second)
+        self.quarters = quarters
+        self.seen_accessions = set(seen_accessions or ())
+        self.filings = []  # Metadata of every filing ingested by this run
+        # An empty CusipMap is falsy (__len__), so test for None to honour one passed on purpose
+        self.cusip_map = cusip_map if cusip_map is not None else CusipMap.from_json(CUSIP_MAP_PATH)
+        self.unmapped_cusips = pd.DataFrame(columns=['cusip', 'name_of_issuer', 'value', 'funds'])
 
     def _setup_logger(self):
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         return logging.getLogger(__name__)
 
-    @sleep_and_retry
-    @limits(calls=RATE_LIMIT, period=RATE_LIMIT_PERIOD)
-    def get_13f_filings(self, cik):
-        try:
-            url = f"{self.BASE_URL}CIK{cik}.json"
-            # self.logger.info(f"Fetching URL: {url}")
-            response = requests.get(url, headers=self.HEADERS)
-            response.raise_for_status()
-            data = response.json()
-            filings = data['filings']['recent']
-            filings_df = pd.DataFrame(filings)
-            form_13f_df = filings_df[filings_df['form'] == '13F-HR']
-            return form_13f_df.iloc[:1]
-        except RequestException as e:
-            self.logger.error(f"RequestException for CIK {cik}: {e}")
+    async def get_13f_filings(self, client, cik):
+        """
+        Return the latest `quarters` 13F-HR filings of a fund that are not in seen_accessions. Older
+        filers keep only ~1000 filings in `recent`; the rest are paged from the `filings.files` archive.
+        """
+        url = f"{self.BASE_URL}CIK{cik}.json"
+        # self.logger.info(f"Fetching URL: {url}")
+        content = await self._make_request(client, url, ttl=self.SUBMISSIONS_TTL)
+        if content is None:
             return pd.DataFrame()
+        data = json.loads(content)
+        form_13f_df = self._select_13f(data['filings']['recent'])
+
+        for archive in data['filings'].get('files', []):
+            if len(form_13f_df) >= self.quarters:
+                break
+            # Archive pages only hold older filings and do not change, so the cached copy never expires
+            archive_content = await self._make_request(client, f"{self.BASE_URL}{archive['name']}")
+            if archive_content is None:
+                break
+            form_13f_df = pd.concat([form_13f_df, self._select_13f(json.loads(archive_content))], ignore_index=True)
+
+        form_13f_df = form_13f_df.iloc[:self.quarters]
+        return form_13f_df[~form_13f_df['accessionNumber'].isin(self.seen_accessions)]
 
-    @sleep_and_retry
-    @limits(calls=RATE_LIMIT, period=RATE_LIMIT_PERIOD)
-    def get_13f_details(self, accession_number, cik, date_part):
+    @staticmethod
+    def _select_13f(filings):
+        filings_df = pd.DataFrame(filings)
+        if filings_df.empty:
+            return pd.DataFrame(columns=['accessionNumber', 'filingDate', 'reportDate'])
+        form_13f_df = filings_df[filings_df['form'] == '13F-HR']
+        return form_13f_df[['accessionNumber', 'filingDate', 'reportDate']]
+
+    async def get_13f_details(self, client, accession_number, cik, date_part):
         file_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number.replace('-', '')}/{accession_number}-index.htm"
         self.logger.info(f"Fetching URL: {file_url}")
 
-        response = self._make_request(file_url)
-        if response is None:
+        content = await self._make_request(client, file_url)
+        if content is None:
             return pd.DataFrame()
 
-        xml_file_url = self._extract_xml_file_url(response.content, cik, accession_number)
+        xml_file_url = self._extract_xml_file_url(content, cik, accession_number)
         if xml_file_url is None:
             return pd.DataFrame()
 
-        xml_response = self._make_request(xml_file_url)
-        if xml_response is None:
+        xml_content = await self._make_request(client, xml_file_url)
+        if xml_content is None:
             return pd.DataFrame()
 
-        df = self._parse_xml_response(xml_response.content, date_part)
+        # Parsing is CPU bound; keep it off the event loop so other funds keep downloading
+        df = await asyncio.to_thread(self._parse_xml_response, xml_content, date_part)
         if df is None:
             return pd.DataFrame()
 
         df = self._clean_dataframe(df, date_part)
         return df
 
-    def _make_request(self, url):
+    async def _make_request(self, client, url, ttl=None):
+        """
+        Return the body of url, served from the on-disk cache when possible. Only network requests
+        take a token from the SEC rate limiter.
+        :param ttl: Maximum age in seconds of a cached copy; filing documents are cached forever.
+        """
+        content = self.cache.get(url, ttl=ttl)
+        if content is not None:
+            return content
         try:
-            response = requests.get(url, headers=self.HEADERS)
-            response.raise_for_status()
-            return response
-        except RequestException as e:
-            self.logger.error(f"RequestException for URL {url}: {e}")
+            content = await client.get(url)
+            self.cache.put(url, content)
+            return content
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Request error for URL {url}: {e!r}")
             return None
 
     def _extract_xml_file_url(self, html_content, cik, accession_number):
+        """
+        Return the URL of the raw information table XML. The index lists the information table twice,
+        as the raw .xml and as an HTML rendering under an xslForm13F directory; only the raw file is used.
+        """
         soup = BeautifulSoup(html_content, 'html.parser')
         table = soup.find('table', class_='tableFile')
         if not table:
@@ -89,88 +144,194 @@ class SecProcessor:
 
         rows = table.find_all('tr')
         for row in rows:
-            if 'information table' in row.text.lower():
-                return 'https://www.sec.gov' + row.find('a')['href']
+            if 'information table' not in row.text.lower():
+                continue
+            link = row.find('a')
+            href = link['href'] if link else ''
+            if href.lower().endswith('.xml') and '/xsl' not in href.lower():
+                return 'https://www.sec.gov' + href
 
         self.logger.error(f"Information table link not found for CIK {cik}, accession number {accession_number}")
         return None
 
     def _parse_xml_response(self, xml_content, date_part):
-        xml_soup = BeautifulSoup(xml_content, 'xml')
-        tables = xml_soup.find_all('table', {'summary': 'Form 13F-NT Header Information'})
-        if not tables:
-            self.logger.error(f"XML tables not found in information table for date part {date_part}")
+        """
+        Stream the raw infoTable XML into typed column arrays. Each infoTable element is read once and
+        released as soon as its values are collected, so memory stays bounded by the output columns.
+        Namespaces are ignored and filings without a FIGI column get an empty one.
+        """
+        columns = {col: [] for col in self.COLUMNS}
+        text_fields = {
+            'nameOfIssuer': 'name_of_issuer', 'titleOfClass': 'title_of_class', 'cusip': 'cusip',
+            'figi': 'figi', 'sshPrnamtType': 'prn', 'putCall': 'put_call',
+            'investmentDiscretion': 'discretion', 'otherManager': 'manager',
+        }
+        int_fields = {
+            'value': 'value', 'sshPrnamt': 'prn_amt',
+            'Sole': 'voting_sole', 'Shared': 'voting_shared', 'None': 'voting_none',
+        }
+
+        row = {}
+        root = None
+        try:
+            for event, elem in ET.iterparse(BytesIO(xml_content), events=('start', 'end')):
+                tag = elem.tag.rsplit('}', 1)[-1]
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    elif tag == 'infoTable':
+                        row = {}
+                    continue
+
+                if tag in text_fields:
+                    row[text_fields[tag]] = elem.text.strip() if elem.text else None
+                elif tag in int_fields:
+                    row[int_fields[tag]] = self._parse_int(elem.text)
+                elif tag == 'infoTable':
+                    for col, values in columns.items():
+                        values.append(row.get(col))
+                    # Drop the processed element from the tree so the document is never held in memory
+                    root.clear()
+        except ET.ParseError as e:
+            self.logger.error(f"Invalid information table XML for date part {date_part}: {e}")
             return None
 
-        df_list = pd.read_html(StringIO(str(tables)))
-        if not df_list:
-            self.logger.error(f"No DataFrames parsed from XML for date part {date_part}")
+        if not columns['cusip']:
+            self.logger.error(f"No infoTable entries found in information table for date part {date_part}")
             return None
 
-        df = df_list[0].iloc[3:]
+        df = pd.DataFrame({
+            col: pd.array(values, dtype='Int64') if col in self.INT_COLUMNS else values
+            for col, values in columns.items()
+        })
+        df[self.KEY_TEXT_COLUMNS] = df[self.KEY_TEXT_COLUMNS].fillna('')
         return df
 
+    @staticmethod
+    def _parse_int(text):
+        if text is None:
+            return None
+        try:
+            return int(float(text.strip().replace(',', '')))
+        except ValueError:
+            return None
+
     def _clean_dataframe(self, df, date_part):
-        column = ['name_of_issuer', 'title_of_class', 'cusip', 'figi', 'value', 'prn_amt', 'prn',
-                  'put_call', 'discretion', 'manager', 'voting_sole', 'voting_shared', 'voting_none']
-        column_2 = ['name_of_issuer', 'title_of_class', 'cusip', 'value', 'prn_amt', 'prn',
-                    'put_call', 'discretion', 'manager', 'voting_sole', 'voting_shared', 'voting_none']
-        col_int = ['value', 'prn_amt', 'voting_sole', 'voting_shared', 'voting_none']
-
-        col_length = len(df.columns)
-        if col_length == 13:
-            df.columns = column
+        """
+        Normalize an information table with column-wise pandas operations: text columns get newlines
+        replaced and whitespace stripped, numeric columns are parsed (thousands separators removed) into
+        nullable Int64, so the output dtypes do not depend on the filing's contents.
+        """
+        if len(df.columns) == len(self.COLUMNS):
+            df.columns = self.COLUMNS
         else:
-            df.columns = column_2
-            df['figi'] = np.nan
-            df = df[column]
-
-        df['trans_date'] = datetime.datetime.strptime(date_part, '%Y-%m-%d')
-        df[col_int] = df[col_int].apply(pd.to_numeric, errors='coerce')
+            # Older filings have no FIGI column
+            df.columns = [col for col in self.COLUMNS if col != 'figi']
+            df['figi'] = None
+            df = df[self.COLUMNS]
+        df = df.reset_index(drop=True)
 
-        for col in df.columns:
-            df[col] = df[col].apply(lambda x: x if pd.isna(x) else str(x).replace('\n', ' '))
+        for col in self.INT_COLUMNS:
+            values = df[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values.astype('string').str.replace(',', '', regex=False), errors='coerce')
+            df[col] = values.round().astype('Int64')
 
-        df['value'] = df['value'].apply(lambda x: x if not isinstance(x, str) or ',' not in x else x.split(','))
-        df = df.explode('value')
-        df['value'] = df['value'].apply(lambda x: x.strip())
+        for col in self.COLUMNS:
+            if col not in self.INT_COLUMNS:
+                df[col] = self._normalize_text(df[col])
 
+        df['trans_date'] = pd.to_datetime(date_part, format='%Y-%m-%d')
         df['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
         return df
 
-    def fetch_fund_data(self, cik):
-        form_13f_df = self.get_13f_filings(cik)
+    def _normalize_text(self, values):
+        """
+        Replace newlines and strip whitespace. Filings repeat the same issuer/class/manager strings many
+        times, so only the distinct values are cleaned and the result is gathered back by position.
+        """
+        codes, uniques = pd.factorize(values)
+        cleaned = pd.Series(uniques, dtype=object).astype(str).str.replace('\n', ' ', regex=False).str.strip()
+        # Code -1 marks a missing value and picks the trailing None
+        lookup = np.append(cleaned.to_numpy(dtype=object), None)
+        return pd.Series(lookup[codes], index=values.index, dtype=object)
+
+    async def fetch_fund_data(self, client, cik):
+        form_13f_df = await self.get_13f_filings(client, cik)
         if form_13f_df.empty:
             return []
 
         fund_data = []
         for _, row in form_13f_df.iterrows():
-            details_df = self.get_13f_details(row['accessionNumber'], cik, row['filingDate'])
+            details_df = await self.get_13f_details(client, row['accessionNumber'], cik, row['filingDate'])
             if not details_df.empty:
+                details_df['cik'] = cik
+                details_df['accession_number'] = row['accessionNumber']
+                details_df['ticker'] = self.cusip_map.lookup(details_df['cusip'])
                 fund_data.append(details_df)
-        time.sleep(1)
+                self.filings.append({
+                    'accession_number': row['accessionNumber'],
+                    'cik': cik,
+                    'filing_date': row['filingDate'],
+                    'report_date': row['reportDate'],
+                    'row_count': len(details_df),
+                })
         return fund_data
 
-    def process_all_funds(self):
-        start_time = time.time()
+    async def process_all_funds_async(self):
+        """
+        Fetch every fund concurrently. Each fund walks submissions -> index -> XML on its own, so the
+        shared rate limiter, not any single fund, decides how fast requests go out.
+        """
         results = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_cik = {executor.submit(self.fetch_fund_data, cik): cik for cik in self.cik_list}
-            for future in as_completed(future_to_cik):
-                cik = future_to_cik[future]
-                try:
-                    data = future.result()
+        # Every attempt, retries included, takes a token from the shared SEC limiter
+        http_client = AsyncHttpClient(headers=self.HEADERS, timeout=self.REQUEST_TIMEOUT,
+                                      limit_per_host=self.max_workers, rate_limiter=self.rate_limiter)
+        async with http_client as client:
+            tasks = [self.fetch_fund_data(client, cik) for cik in self.cik_list]
+            for cik, data in zip(self.cik_list, await asyncio.gather(*tasks, return_exceptions=True)):
+                if isinstance(data, Exception):
+                    self.logger.error(f'{cik} generated an exception: {data}')
+                else:
                     results.extend(data)
-                except Exception as exc:
-                    self.logger.error(f'{cik} generated an exception: {exc}')
+        return results
+
+    def _report_unmapped_cusips(self, df):
+        """
+        Summarize holdings whose CUSIP is missing from the map, largest positions first, so
+        CUSIP_MAP.json can be extended where it matters.
+        """
+        unmapped = df[df['ticker'].isna()]
+        self.unmapped_cusips = (
+            unmapped.groupby('cusip', dropna=False)
+            .agg(name_of_issuer=('name_of_issuer', 'first'), value=('value', 'sum'), funds=('cik', 'nunique'))
+            .sort_values('value', ascending=False)
+            .reset_index()
+        )
+        if self.unmapped_cusips.empty:
+            return
+        self.logger.warning(
+            f"{len(self.unmapped_cusips)} of {df['cusip'].nunique()} CUSIPs have no ticker "
+            f"({len(unmapped)} of {len(df)} holdings). Largest unmapped:\n"
+            f"{self.unmapped_cusips.head(20).to_string(index=False)}"
+        )
+
+    def process_all_funds(self):
+        start_time = time.time()
+        results = asyncio.run(self.process_all_funds_async())
 
+        df_all = None
         if results:
             df_all = pd.concat(results, ignore_index=True)
             df_all.replace('None', pd.NA, inplace=True)
             self.logger.info('All data was collected.')
-            return df_all
+            self._report_unmapped_cusips(df_all)
         else:
-            self.logger.warning('No data was collected.')
+            self.logger.warning('No new 13F filings were collected.')
 
         end_time = time.time()
         self.logger.info(f'Total execution time: {end_time - start_time:.2f} seconds')
+        self.logger.info(f'SEC cache stats: {self.cache.get_stats()}')
+        self.logger.info(f'SEC rate limiter stats: {self.rate_limiter.stats}')
+        self.logger.info(f'HTTP metrics: {get_http_metrics()}')
+        return df_all
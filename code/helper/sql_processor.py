@@ -1,19 +1,107 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, BigInteger, VARCHAR , inspect, text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Date, BigInteger, VARCHAR , text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.types import TypeEngine
 import pandas as pd
+import datetime
+import hashlib
+import io
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from helper.migration_processor import MigrationProcessor
+from helper.engine_registry import get_engine, get_async_pool
+from psycopg2.extras import execute_values
+
+# Natural key per table: rows sharing these values describe the same fact, so insert_data merges on them
+# instead of appending. Snapshot tables include date_insert so each day keeps exactly one snapshot.
+# Text key columns are stored as '' instead of NULL (a NULL never conflicts in a unique index), and
+# data/MIGRATIONS.json version 8 brings rows written before the keys existed in line with them.
+NATURAL_KEYS = {
+    'dataroma_screen_insider': ('ticker', 'date_filling', 'company', 'price', 'date_insert'),
+    'dataroma_insider_buy': ('symbol', 'relationship', 'trans_date', 'purchase_sale', 'price', 'security',
+                             'reporting_name', 'di', 'date_insert'),
+    'dataroma_bigbets': ('ticker', 'date_insert'),
+    'dataroma_low': ('ticker', 'date_insert'),
+    'dataroma_insider_super': ('ticker', 'date_insert'),
+    'finviz_screen': ('screen_name', 'ticker', 'date_insert'),
+    'magic_screen': ('variant', 'ticker', 'date_insert'),
+    # One filing can list a CUSIP on several infoTable rows (puts/calls, share classes, discretion, managers)
+    'sec_13f': ('cusip', 'cik', 'trans_date', 'date_insert', 'put_call', 'title_of_class', 'discretion', 'manager'),
+    'sec_13f_accession': ('accession_number',),
+    'cusip_map': ('cusip',),
+    'yahoofinance_history': ('symbol', 'date'),
+    'yahoofinance_history_mark': ('symbol',),
+    'yahoofinance_freshness': ('ticker', 'dataset'),
+    'yahoofinance_metadata': ('ticker_name', 'date_insert'),
+    'yahoofinance_holders': ('symbol', 'type', 'holder', 'date_insert'),
+    'yahoofinance_insider_roster_holders': ('symbol', 'name', 'date_insert'),
+    'yahoofinance_cash_flow': ('symbol', 'frequency', 'date', 'date_insert'),
+    'yahoofinance_balance_sheet': ('symbol', 'frequency', 'date', 'date_insert'),
+    'yahoofinance_income_statement': ('symbol', 'frequency', 'date', 'date_insert'),
+}
+
+# Snapshot tables stored as monthly range partitions on date_insert (see data/MIGRATIONS.json).
+# Partitions older than retention_months are detached, or dropped when expire is 'drop'.
+# yahoofinance_history is merged on (symbol, date) rather than snapshotted, so it is not partitioned.
+PARTITIONED_TABLES = {
+    'dataroma_bigbets': {'retention_months': 6, 'expire': 'drop'},
+    'dataroma_insider_buy': {'retention_months': 12, 'expire': 'detach'},
+    'dataroma_insider_super': {'retention_months': 6, 'expire': 'drop'},
+    'dataroma_low': {'retention_months': 6, 'expire': 'drop'},
+    'dataroma_screen_insider': {'retention_months': 6, 'expire': 'drop'},
+    'finviz_screen': {'retention_months': 6, 'expire': 'drop'},
+    'magic_screen': {'retention_months': 6, 'expire': 'drop'},
+    'sec_13f': {'retention_months': 24, 'expire': 'detach'},
+    'yahoofinance_balance_sheet': {'retention_months': 3, 'expire': 'drop'},
+    'yahoofinance_cash_flow': {'retention_months': 3, 'expire': 'drop'},
+    'yahoofinance_holders': {'retention_months': 3, 'expire': 'drop'},
+    'yahoofinance_income_statement': {'retention_months': 3, 'expire': 'drop'},
+    'yahoofinance_insider_roster_holders': {'retention_months': 3, 'expire': 'drop'},
+    'yahoofinance_metadata': {'retention_months': 3, 'expire': 'drop'},
+}
+
+# Columns with a fixed SQL type regardless of the DataFrame dtype they arrive with (see data/MIGRATIONS.json)
+COLUMN_TYPES = {
+    'date_insert': Date,
+    'trans_date': Date,
+    'date_filling': Date,
+    'filing_date': Date,
+    'report_date': Date,
+    'last_date': Date,
+}
 
 class CloudSQLDatabase:
-    def __init__(self, user, password, host, port, database, big_flag=False, logger=None):
+    def __init__(self, user, password, host, port, database, big_flag=False, logger=None,
+                 bulk_load=True, copy_min_rows=1000, copy_chunk_rows=50000, natural_keys=None,
+                 partitioned_tables=None):
+        """
+        :param bulk_load: Stream frames with COPY FROM STDIN instead of to_sql INSERTs.
+        :param copy_min_rows: Frames smaller than this still go through to_sql.
+        :param copy_chunk_rows: Number of rows serialized and sent per COPY chunk.
+        :param natural_keys: Table -> key columns to merge on (defaults to NATURAL_KEYS).
+        :param partitioned_tables: Table -> retention policy for date_insert partitions (defaults to PARTITIONED_TABLES).
+        """
         self.logger = logger
         self.database_uri = f'postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}'
-        self.engine = create_engine(self.database_uri)
+        self.async_dsn = f'postgresql://{user}:{password}@{host}:{port}/{database}'
+        self.engine = get_engine(self.database_uri)  # Shared pool for every helper on this DSN
         self.Base = declarative_base()
         self.Session = sessionmaker(bind=self.engine)
         self.session = self.Session()
         self.tables = {}
         self.big_flag = big_flag
+        self.bulk_load = bulk_load
+        self.copy_min_rows = copy_min_rows
+        self.copy_chunk_rows = copy_chunk_rows
+        self.load_stats = {}  # Per-table bulk load statistics (keyed by table_name)
+        self.natural_keys = NATURAL_KEYS if natural_keys is None else natural_keys
+        self._keyed_tables = set()  # Tables whose natural key index has been verified in this process
+        self.partitioned_tables = PARTITIONED_TABLES if partitioned_tables is None else partitioned_tables
+        self._partitions = {}  # table_name -> set of month starts known to have a partition
+        self._catalog = None  # table_name -> set of lowercase column names, loaded on first use
+        self._catalog_lock = threading.RLock()
+        self.catalog_stats = {'hits': 0, 'misses': 0, 'loads': 0, 'invalidations': 0}
 
     def create_table(self, table_name, columns):
         if self.table_exists(table_name):
@@ -23,16 +111,29 @@ class CloudSQLDatabase:
             '__tablename__': table_name,
             'id': Column(Integer, primary_key=True, autoincrement=True),
         }
+        if table_name in self.partitioned_tables:
+            # The partition key has to be part of the primary key
+            class_attrs['__table_args__'] = {'postgresql_partition_by': 'RANGE (date_insert)'}
+            class_attrs['date_insert'] = Column(Date, primary_key=True)
 
         for column_name, column_type in columns.items():
-            if isinstance(column_type, TypeEngine):
+            if column_name in class_attrs:
+                continue
+            if column_name in COLUMN_TYPES:
+                class_attrs[column_name] = Column(COLUMN_TYPES[column_name])
+            elif isinstance(column_type, TypeEngine):
                 class_attrs[column_name] = Column(column_type)
             else:
                 class_attrs[column_name] = Column(self._get_sqlalchemy_type(column_type))
 
         table_class = type(table_name, (self.Base,), class_attrs)
         self.tables[table_name] = table_class
-        self.Base.metadata.create_all(self.engine)
+        try:
+            self.Base.metadata.create_all(self.engine)
+        except Exception:
+            self.invalidate_catalog()
+            raise
+        self._catalog_add_columns(table_name, ['id', *columns.keys()])
         self.logger.info(f"Table '{table_name}' created successfully")
 
     def update_table_schema(self, table_name, df):
@@ -40,9 +141,7 @@ class CloudSQLDatabase:
             self.logger.info(f"Table '{table_name}' does not exist.")
             return
 
-        inspector = inspect(self.engine)
-        existing_columns = inspector.get_columns(table_name)
-        existing_column_names = {col['name'].lower() for col in existing_columns}
+        existing_column_names = self._get_catalog().get(table_name, set())
 
         new_columns = []
         for column in df.columns:
@@ -50,11 +149,16 @@ class CloudSQLDatabase:
                 new_columns.append((column, self._get_sqlalchemy_type(df[column].dtype)))
 
         if new_columns:
-            with self.engine.connect() as conn:
-                for column_name, column_type in new_columns:
-                    alter_query = text(f'ALTER TABLE "{table_name}" ADD COLUMN "{column_name}" {column_type.__visit_name__.upper()}')
-                    conn.execute(alter_query)
-                    conn.commit()
+            try:
+                with self.engine.connect() as conn:
+                    for column_name, column_type in new_columns:
+                        alter_query = text(f'ALTER TABLE "{table_name}" ADD COLUMN "{column_name}" {column_type.__visit_name__.upper()}')
+                        conn.execute(alter_query)
+                        conn.commit()
+                        self._catalog_add_columns(table_name, [column_name])
+            except Exception:
+                self.invalidate_catalog()
+                raise
             self.logger.info(f"Table '{table_name}' updated with new columns: {[col[0] for col in new_columns]}")
 
             
@@ -80,9 +184,14 @@ class CloudSQLDatabase:
         return dtype_map.get(str(dtype), String)
 
     def insert_data(self, table_name, data):
+        """
+        Write a DataFrame into an existing table. A failed write is rolled back and re-raised, so callers
+        can rely on a normal return meaning the rows are stored.
+        :return: False if the table does not exist, True once the rows are written.
+        """
         if not self.table_exists(table_name):
             self.logger.info(f"Table '{table_name}' does not exist.")
-            return
+            return False
 
         # Update the table schema with new columns if necessary
         self.update_table_schema(table_name, data)
@@ -104,11 +213,301 @@ class CloudSQLDatabase:
             # Map original column names to lowercase with underscores for insertion
             data.columns = [col.replace(' ', '_').lower() for col in data.columns]
 
-            data.to_sql(table_name, self.engine, if_exists='append', index=False)
+            if table_name in self.partitioned_tables and 'date_insert' in data.columns:
+                self._ensure_partitions(table_name, data['date_insert'])
+
+            key_columns = self.natural_keys.get(table_name)
+            if key_columns and set(key_columns).issubset(data.columns):
+                text_keys = [col for col in key_columns if data[col].dtype == 'object']
+                data[text_keys] = data[text_keys].fillna('')
+                self._merge_data(table_name, data, key_columns)
+            elif self.bulk_load and len(data) >= self.copy_min_rows:
+                if key_columns:
+                    self.logger.warning(f"Natural key {key_columns} not present in frame for '{table_name}', appending")
+                try:
+                    self._copy_data(table_name, data)
+                except Exception as e:
+                    # COPY is strict about text formats (e.g. '1.0' into bigint); fall back to row inserts
+                    self.logger.warning(f"COPY into '{table_name}' failed, falling back to to_sql: {e}")
+                    data.to_sql(table_name, self.engine, if_exists='append', index=False)
+            else:
+                data.to_sql(table_name, self.engine, if_exists='append', index=False)
             self.logger.info(f"Data inserted successfully into '{table_name}'")
+            return True
         except Exception as e:
-            self.logger.info(f"Error while inserting data: {e}")
+            self.logger.error(f"Error while inserting data into '{table_name}': {e}")
             self.session.rollback()
+            raise
+
+    def _copy_chunks(self, cursor, table_name, data):
+        """
+        Stream a DataFrame through COPY FROM STDIN on an open cursor, one bounded CSV chunk at a time.
+        :return: Tuple of (rows, bytes) sent.
+        """
+        columns = ', '.join(f'"{col}"' for col in data.columns)
+        copy_sql = f'COPY "{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'
+
+        total_rows = 0
+        total_bytes = 0
+        for start in range(0, len(data), self.copy_chunk_rows):
+            chunk = data.iloc[start:start + self.copy_chunk_rows]
+            payload = chunk.to_csv(index=False, header=False, na_rep='\\N').encode('utf-8')
+            cursor.copy_expert(copy_sql, io.BytesIO(payload))
+            total_rows += len(chunk)
+            total_bytes += len(payload)
+        return total_rows, total_bytes
+
+    def _insert_chunks(self, cursor, table_name, data):
+        """
+        Multi-row INSERT of a DataFrame on an open cursor, copy_chunk_rows rows per statement.
+        :return: Rows sent.
+        """
+        columns = ', '.join(f'"{col}"' for col in data.columns)
+        values = data.astype(object)
+        values = values.where(pd.notnull(values), None)
+        rows = list(values.itertuples(index=False, name=None))
+        execute_values(cursor, f'INSERT INTO "{table_name}" ({columns}) VALUES %s', rows, page_size=self.copy_chunk_rows)
+        return len(rows)
+
+    def _copy_data(self, table_name, data):
+        """
+        Append a DataFrame to an existing table with COPY FROM STDIN.
+        The whole load runs in a single transaction so a failed chunk leaves the table untouched.
+        """
+        start_time = time.perf_counter()
+        raw_conn = self.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                total_rows, total_bytes = self._copy_chunks(cursor, table_name, data)
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+        self._record_load_stats(table_name, 'COPY', total_rows, total_bytes, time.perf_counter() - start_time)
+
+    def _merge_data(self, table_name, data, key_columns):
+        """
+        Upsert a DataFrame on its natural key: COPY into a temporary staging table shaped like the target,
+        then INSERT ... ON CONFLICT into the target. Rows whose values did not change are not rewritten,
+        so re-running a pipeline on the same day costs a staging load and an index probe per row. If COPY
+        rejects a value the stage is loaded with plain INSERTs instead, like the append path's to_sql fallback.
+        """
+        self._ensure_natural_key(table_name, key_columns)
+
+        stage_name = f'stage_{table_name}'
+        columns = [col for col in data.columns if col != 'id']
+        update_columns = [col for col in columns if col not in key_columns]
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        key_list = ', '.join(f'"{col}"' for col in key_columns)
+
+        if update_columns:
+            set_clause = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in update_columns)
+            current_row = ', '.join(f't."{col}"' for col in update_columns)
+            incoming_row = ', '.join(f'EXCLUDED."{col}"' for col in update_columns)
+            conflict_action = f'DO UPDATE SET {set_clause} WHERE ({current_row}) IS DISTINCT FROM ({incoming_row})'
+        else:
+            conflict_action = 'DO NOTHING'
+
+        # DISTINCT ON keeps the last staged row per key so a frame with repeated keys behaves like sequential upserts
+        merge_sql = (
+            f'INSERT INTO "{table_name}" AS t ({column_list}) '
+            f'SELECT DISTINCT ON ({key_list}) {column_list} FROM "{stage_name}" ORDER BY {key_list}, ctid DESC '
+            f'ON CONFLICT ({key_list}) {conflict_action}'
+        )
+
+        start_time = time.perf_counter()
+        raw_conn = self.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TEMP TABLE "{stage_name}" ON COMMIT DROP AS '
+                    f'SELECT {column_list} FROM "{table_name}" WITH NO DATA'
+                )
+                cursor.execute('SAVEPOINT stage_copy')
+                try:
+                    total_rows, total_bytes = self._copy_chunks(cursor, stage_name, data[columns])
+                except Exception as e:
+                    # COPY is strict about text formats (e.g. '1.0' into bigint); stage through a parameterized
+                    # insert instead, which lets Postgres apply its assignment casts
+                    self.logger.warning(f"COPY into stage of '{table_name}' failed, staging with INSERT: {e}")
+                    cursor.execute('ROLLBACK TO SAVEPOINT stage_copy')
+                    total_rows, total_bytes = self._insert_chunks(cursor, stage_name, data[columns]), 0
+                cursor.execute(merge_sql)
+                written_rows = cursor.rowcount
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+        self._record_load_stats(table_name, 'MERGE', total_rows, total_bytes, time.perf_counter() - start_time)
+        self.logger.info(f"MERGE '{table_name}': {written_rows} of {total_rows} rows inserted or changed")
+
+    def _ensure_natural_key(self, table_name, key_columns):
+        """
+        Make sure the unique index backing ON CONFLICT exists, once per table per process. The index is
+        built CONCURRENTLY where Postgres allows it (not on partitioned parents) and no rows are deleted
+        here: duplicates from append-only runs are removed by the migrations (init_db.py), and the build
+        fails if any are still present.
+        """
+        if table_name in self._keyed_tables:
+            return
+
+        index_name = f'{table_name}_natural_key'
+        key_list = ', '.join(f'"{col}"' for col in key_columns)
+        try:
+            with self.engine.connect() as conn:
+                index = conn.execute(text(
+                    "SELECT array_agg(a.attname::text ORDER BY k.ord), bool_and(i.indisvalid) FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "CROSS JOIN unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord) "
+                    "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum "
+                    "WHERE c.relname = :name"
+                ), {'name': index_name}).first()
+                is_partitioned = conn.execute(
+                    text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {'table': table_name}
+                ).scalar() is True
+            indexed_columns, is_valid = index if index is not None else (None, None)
+            if indexed_columns is not None and list(indexed_columns) == list(key_columns) and is_valid:
+                self._keyed_tables.add(table_name)
+                return
+
+            # Partitioned parents do not support CONCURRENTLY
+            concurrently = '' if is_partitioned else 'CONCURRENTLY '
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                if indexed_columns is not None:
+                    # The declared key changed since the index was built, or an earlier build was interrupted
+                    conn.execute(text(f'DROP INDEX {concurrently}IF EXISTS "{index_name}"'))
+                conn.execute(text(f'CREATE UNIQUE INDEX {concurrently}"{index_name}" ON "{table_name}" ({key_list})'))
+            self.logger.info(f"Created natural key {index_name} ({key_list})")
+        except Exception as e:
+            self.invalidate_catalog()
+            self.logger.error(f"Could not build natural key {index_name} ({key_list}); "
+                              f"run init_db.py so the migrations remove rows duplicated on the key: {e}")
+            raise
+        self._keyed_tables.add(table_name)
+
+    def _ensure_partitions(self, table_name, date_insert):
+        """
+        Create the monthly partitions needed for the dates being loaded. Known partitions are cached,
+        so this is a no-op after the first load of each month.
+        """
+        months = {
+            value.replace(day=1)
+            for value in pd.to_datetime(date_insert, errors='coerce').dropna().dt.date.unique()
+        }
+        known = self._partitions.setdefault(table_name, set())
+        missing = sorted(months - known)
+        if not missing:
+            return
+
+        with self.engine.connect() as conn:
+            is_partitioned = conn.execute(
+                text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {'table': table_name}
+            ).scalar()
+            if not is_partitioned:
+                # Plain table (migration 3 not applied yet): nothing to create
+                known.update(missing)
+                return
+            for month in missing:
+                conn.execute(text(MigrationProcessor.partition_ddl(table_name, month)))
+            conn.commit()
+        known.update(missing)
+        self.logger.info(f"Partitions ready for '{table_name}': {[month.isoformat() for month in missing]}")
+
+    def prune_partitions(self, today=None):
+        """
+        Apply the retention policy of every partitioned table: partitions whose month ended before the
+        cutoff are detached (and dropped when expire is 'drop'). Detaching and dropping only touch the
+        catalog, so cleanup never scans or deletes rows.
+        :return: List of partition names that were pruned.
+        """
+        today = today or datetime.date.today()
+        pruned = []
+        with self.engine.connect() as conn:
+            for table_name, policy in self.partitioned_tables.items():
+                months_back = today.year * 12 + today.month - 1 - policy['retention_months']
+                cutoff = datetime.date(months_back // 12, months_back % 12 + 1, 1)
+                partitions = conn.execute(text(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = to_regclass(:table)"
+                ), {'table': table_name}).scalars().all()
+
+                for partition_name in partitions:
+                    suffix = partition_name.rsplit('_p', 1)[-1]
+                    try:
+                        month = datetime.datetime.strptime(suffix, '%Y_%m').date()
+                    except ValueError:
+                        continue
+                    if month >= cutoff:
+                        continue
+                    conn.execute(text(f'ALTER TABLE "{table_name}" DETACH PARTITION "{partition_name}"'))
+                    if policy['expire'] == 'drop':
+                        conn.execute(text(f'DROP TABLE "{partition_name}"'))
+                    conn.commit()
+                    self._partitions.get(table_name, set()).discard(month)
+                    pruned.append(partition_name)
+
+        self.logger.info(f"Pruned {len(pruned)} expired partitions: {pruned}")
+        return pruned
+
+    def refresh_materialized_views(self, views):
+        """
+        Refresh the precomputed views read by the LLM pipeline (see data/MATVIEW.json). A view is
+        (re)created when missing or when its definition changed, otherwise refreshed CONCURRENTLY
+        against its unique index so readers are never blocked.
+        :param views: Dict of view name -> {'query': ..., 'unique_columns': [...]}.
+        :return: Dict of view name -> refresh seconds (None when the refresh failed).
+        """
+        timings = {}
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for view_name, view in views.items():
+                start_time = time.perf_counter()
+                unique_columns = ', '.join(f'"{col}"' for col in view['unique_columns'])
+                checksum = hashlib.md5(f"{view['query']}|{unique_columns}".encode()).hexdigest()
+                try:
+                    current = conn.execute(
+                        text("SELECT obj_description(to_regclass(:view), 'pg_class')"), {'view': view_name}
+                    ).scalar()
+                    if current == checksum:
+                        conn.execute(text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY "{view_name}"'))
+                    else:
+                        # Swap the definition in one transaction so readers see either the old or the new view
+                        with self.engine.begin() as ddl_conn:
+                            ddl_conn.execute(text(f'DROP MATERIALIZED VIEW IF EXISTS "{view_name}"'))
+                            ddl_conn.execute(text(f'CREATE MATERIALIZED VIEW "{view_name}" AS {view["query"]}'))
+                            ddl_conn.execute(text(
+                                f'CREATE UNIQUE INDEX "{view_name}_key" ON "{view_name}" ({unique_columns})'
+                            ))
+                            ddl_conn.execute(text(f"COMMENT ON MATERIALIZED VIEW \"{view_name}\" IS '{checksum}'"))
+                        self.logger.info(f"Created materialized view '{view_name}'")
+                    timings[view_name] = time.perf_counter() - start_time
+                except Exception as e:
+                    self.logger.error(f"Error refreshing materialized view '{view_name}': {e}")
+                    timings[view_name] = None
+
+        self.logger.info(f"Materialized view refresh times: {timings}")
+        return timings
+
+    def _record_load_stats(self, table_name, mode, total_rows, total_bytes, elapsed):
+        stats = self.load_stats.setdefault(table_name, {'rows': 0, 'bytes': 0, 'seconds': 0.0, 'loads': 0})
+        stats['rows'] += total_rows
+        stats['bytes'] += total_bytes
+        stats['seconds'] += elapsed
+        stats['loads'] += 1
+        stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        stats['mb_per_sec'] = stats['bytes'] / 1e6 / stats['seconds'] if stats['seconds'] else 0.0
+        self.logger.info(
+            f"{mode} '{table_name}': {total_rows} rows, {total_bytes / 1e6:.2f} MB in {elapsed:.2f}s "
+            f"({total_rows / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+
+    def get_load_stats(self):
+        return {table_name: dict(stats) for table_name, stats in self.load_stats.items()}
 
     def fetch_data(self, query):
         try:
@@ -122,10 +521,91 @@ class CloudSQLDatabase:
             self.logger.error(f"Error while fetching data: {e}")
             return None
 
+    def fetch_data_batch(self, queries, max_workers=None):
+        """
+        Run several named queries concurrently, each on its own pooled connection.
+        :param queries: Dict of name -> query (string or {'query': ...}).
+        :param max_workers: Concurrent queries (defaults to one per query, capped by the pool size).
+        :return: Dict of name -> DataFrame (None for a failed query), in the same order as queries.
+        """
+        def timed_fetch(name, query):
+            start_time = time.perf_counter()
+            df = self.fetch_data(query)
+            elapsed = time.perf_counter() - start_time
+            rows = len(df) if df is not None else 0
+            self.logger.info(f"Query '{name}' returned {rows} rows in {elapsed:.2f}s")
+            return df
+
+        start_time = time.perf_counter()
+        max_workers = max_workers or min(len(queries), self.engine.pool.size()) or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {name: executor.submit(timed_fetch, name, query) for name, query in queries.items()}
+            results = {name: future.result() for name, future in futures.items()}
+        self.logger.info(f"Fetched {len(queries)} queries in {time.perf_counter() - start_time:.2f}s")
+        return results
+
+    async def fetch_records_async(self, query):
+        """
+        Run a query on the event loop through the shared asyncpg pool.
+        :return: Tuple of (column names, list of asyncpg Records).
+        """
+        if isinstance(query, dict):
+            query = query['query']
+        pool = await get_async_pool(self.async_dsn)
+        async with pool.acquire() as conn:
+            statement = await conn.prepare(query)
+            columns = [attribute.name for attribute in statement.get_attributes()]
+            records = await statement.fetch()
+        return columns, records
+
+    async def fetch_data_async(self, query):
+        """
+        Async counterpart of fetch_data: the query runs on asyncpg without occupying a worker thread.
+        """
+        try:
+            columns, records = await self.fetch_records_async(query)
+            return pd.DataFrame.from_records(records, columns=columns)
+        except Exception as e:
+            self.logger.error(f"Error while fetching data: {e}")
+            return None
+
     def close_connection(self):
         self.session.close()
         self.logger.info("PostgreSQL connection is closed")
 
     def table_exists(self, table_name):
-        inspector = inspect(self.engine)
-        return table_name in inspector.get_table_names()
+        if table_name in self._get_catalog():
+            self.catalog_stats['hits'] += 1
+            return True
+        # Negative answers may be stale (e.g. init_db created the table after our load), so reload once
+        self.catalog_stats['misses'] += 1
+        return table_name in self._get_catalog(reload=True)
+
+    def _get_catalog(self, reload=False):
+        """
+        Return the cached table -> columns catalog, reading it from the server in a single round-trip
+        the first time (or after an invalidation).
+        """
+        with self._catalog_lock:
+            if self._catalog is None or reload:
+                query = text(
+                    "SELECT table_name, column_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema()"
+                )
+                catalog = {}
+                with self.engine.connect() as conn:
+                    for table_name, column_name in conn.execute(query):
+                        catalog.setdefault(table_name, set()).add(column_name.lower())
+                self._catalog = catalog
+                self.catalog_stats['loads'] += 1
+            return self._catalog
+
+    def _catalog_add_columns(self, table_name, column_names):
+        with self._catalog_lock:
+            if self._catalog is not None:
+                self._catalog.setdefault(table_name, set()).update(col.lower() for col in column_names)
+
+    def invalidate_catalog(self):
+        with self._catalog_lock:
+            self._catalog = None
+            self.catalog_stats['invalidations'] += 1
@@ -1,15 +1,21 @@
 import concurrent.futures
-import pandas as pd
-from helper.yahoo_processor import StockData
+from helper.yahoo_processor import StockData, HistoryDownloader
 from helper.sql_processor import CloudSQLDatabase
+from helper.table_writer import TableWriter
+from helper.freshness import FreshnessRegistry, FRESHNESS_TABLE
+
+# Datasets tracked in the freshness registry; each lands in yahoofinance_<dataset>
+DATASETS = ['history'] + list(StockData.FETCH_PLAN)
 class StockDetail:
-    def __init__(self, logger, env_vars, max_workers=8):
+    def __init__(self, logger, env_vars, max_workers=8, flush_rows=50000, flush_bytes=64 * 1024 * 1024):
         """
         Initialize StockDetail class with a list of stock symbols, logger, and SQL helper.
         :param stock_symbol_list: List of stock symbols to fetch data for.
         :param logger: Logger for logging information and errors.
         :param sql_helper: SQL helper object for database operations.
         :param max_workers: Maximum number of threads to run in parallel (default is 8).
+        :param flush_rows: Buffered rows of a table that trigger a write while fetches continue.
+        :param flush_bytes: Buffered bytes of a table that trigger a write while fetches continue.
         """
         self.logger = logger
         self.sql_helper = CloudSQLDatabase(
@@ -21,37 +27,42 @@ class StockDetail:
             big_flag=True,
             logger=logger
         )
-        self.all_data_by_table = {}  # Dictionary to hold data for each table (keyed by table_name)
         self.max_workers = max_workers
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+
+    def _make_writer(self):
+        # One writer per run: nothing buffered survives into the next pipeline call
+        return TableWriter(self.sql_helper, self.logger, max_rows=self.flush_rows, max_bytes=self.flush_bytes)
 
     def process_yahoo_finance_pipeline(self, stock_symbol_list: list):
         """
-        Fetch Yahoo Finance data for all stock symbols concurrently and batch insert into the database.
+        Fetch Yahoo Finance data concurrently for the datasets still due according to the freshness registry;
+        results are written in batches per table while the remaining fetches are still running.
         """
         try:
-            created_tables = set()
-
-            # Step 1: Fetch and store all data concurrently
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit fetch task for each stock symbol
-                future_to_symbol = {executor.submit(self._fetch_stock_data, stock_symbol): stock_symbol for stock_symbol in stock_symbol_list}
+            registry = FreshnessRegistry.from_json(self.sql_helper, self.logger).load()
+            plan = registry.plan(stock_symbol_list, DATASETS)
+            fresh = []
+
+            with self._make_writer() as writer, \
+                    concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # Submit fetch task for each stock symbol with a stale dataset
+                future_to_symbol = {executor.submit(self._fetch_stock_data, stock_symbol, datasets): stock_symbol
+                                    for stock_symbol, datasets in self._dataset_plan(plan).items()}
+                # The grouped history download runs here while the workers fetch everything else
+                fresh.extend(self._load_history(self._history_plan(plan), writer))
 
                 for future in concurrent.futures.as_completed(future_to_symbol):
                     stock_symbol = future_to_symbol[future]
                     try:
                         stock_symbol_data = future.result()  # Fetch result for each stock symbol
                         self.logger.info(f'Data fetched for {stock_symbol}')
-                        self._collect_data(stock_symbol_data)  # Collect the data after fetching
+                        fresh.extend(self._collect_data(stock_symbol, stock_symbol_data, writer))  # Buffer, flushing full tables
                     except Exception as e:
                         self.logger.error(f"Error fetching data for {stock_symbol}: {e}")
 
-            # Step 2: Insert all collected data in one batch per table
-            for table_name, combined_data in self.all_data_by_table.items():
-                if table_name not in created_tables:
-                    self.sql_helper.create_table(table_name, combined_data.dtypes)
-                    created_tables.add(table_name)
-                self.sql_helper.update_table_schema(table_name, combined_data)
-                self.sql_helper.insert_data(table_name, combined_data)
+                self._mark_fresh(registry, fresh, writer)
 
             self.logger.info("All stock data processed and tables updated successfully")
 
@@ -60,72 +71,103 @@ class StockDetail:
 
     def process_yahoo_finance_pipeline_sync(self, stock_symbol_list: list):
         """
-        Fetch Yahoo Finance data for all stock symbols synchronously and batch insert into the database.
+        Fetch Yahoo Finance data synchronously for the datasets still due and write it in batches per table.
         """
         try:
-            created_tables = set()
-
-            # Step 1: Fetch and store all data synchronously
-            for stock_symbol in stock_symbol_list:
-                try:
-                    # Fetch stock data synchronously for each stock symbol
-                    stock_symbol_data = self._fetch_stock_data(stock_symbol)
-                    self.logger.info(f'Data fetched for {stock_symbol}')
-                    # Collect the data after fetching
-                    self._collect_data(stock_symbol_data)
-                except Exception as e:
-                    self.logger.error(f"Error fetching data for {stock_symbol}: {e}")
-
-            # Step 2: Insert all collected data in one batch per table
-            for table_name, combined_data in self.all_data_by_table.items():
-                if table_name not in created_tables:
-                    self.sql_helper.create_table(table_name, combined_data.dtypes)
-                    created_tables.add(table_name)
-                self.sql_helper.update_table_schema(table_name, combined_data)
-                self.sql_helper.insert_data(table_name, combined_data)
+            registry = FreshnessRegistry.from_json(self.sql_helper, self.logger).load()
+            plan = registry.plan(stock_symbol_list, DATASETS)
+
+            with self._make_writer() as writer:
+                fresh = self._load_history(self._history_plan(plan), writer)
+
+                for stock_symbol, datasets in self._dataset_plan(plan).items():
+                    try:
+                        # Fetch stock data synchronously for each stock symbol
+                        stock_symbol_data = self._fetch_stock_data(stock_symbol, datasets)
+                        self.logger.info(f'Data fetched for {stock_symbol}')
+                        # Buffer the data, flushing full tables
+                        fresh.extend(self._collect_data(stock_symbol, stock_symbol_data, writer))
+                    except Exception as e:
+                        self.logger.error(f"Error fetching data for {stock_symbol}: {e}")
+
+                self._mark_fresh(registry, fresh, writer)
 
             self.logger.info("All stock data processed and tables updated successfully")
 
         except Exception as e:
             self.logger.error(f"An error occurred in Yahoo Finance pipeline: {str(e)}")
 
+    @staticmethod
+    def _history_plan(plan):
+        return [stock_symbol for stock_symbol, datasets in plan.items() if 'history' in datasets]
 
-    def _fetch_stock_data(self, stock_symbol):
+    @staticmethod
+    def _dataset_plan(plan):
+        plan = {stock_symbol: [dataset for dataset in datasets if dataset != 'history'] for stock_symbol, datasets in plan.items()}
+        return {stock_symbol: datasets for stock_symbol, datasets in plan.items() if datasets}
+
+    def _mark_fresh(self, registry, fresh, writer):
+        """
+        Record the fetched (ticker, dataset) pairs once their tables are written. Every flush of a table
+        has to have succeeded (insert_data raises on failure and TableWriter records the table in
+        failed_tables), otherwise none of its pairs are marked and they stay due for the next run.
+        """
+        writer.flush_all()
+        written = [(stock_symbol, dataset) for stock_symbol, dataset in fresh
+                   if 'yahoofinance_' + dataset not in writer.failed_tables]
+        if len(written) < len(fresh):
+            self.logger.warning(f"Freshness: {len(fresh) - len(written)} ticker datasets stay due after failed writes "
+                                f"to {', '.join(sorted(writer.failed_tables))}")
+        if written and not writer.write(FRESHNESS_TABLE, registry.to_frame(written)):
+            self.logger.warning(f"Freshness: could not record {len(written)} ticker datasets, they are fetched again next run")
+
+    def _load_history(self, stock_symbol_list, writer):
+        """
+        Download the price history of every symbol in a few grouped requests and insert it straight away;
+        the per-symbol fetches then skip history. Only bars after each symbol's high-water mark are fetched.
+        :return: (symbol, 'history') pairs that were stored.
+        """
+        if not stock_symbol_list:
+            return []
+        downloader = HistoryDownloader(self.logger)
+        history = downloader.fetch_since(stock_symbol_list, self.load_history_marks())
+        self.logger.info(f'History loaded for {history.symbol.nunique() if not history.empty else 0} of '
+                         f'{len(stock_symbol_list)} symbols ({len(history)} bars)')
+        # Marks only move once the bars behind them are stored: write() is False unless insert_data committed
+        if history.empty or not writer.write('yahoofinance_history', history):
+            return []
+        marks = downloader.history_marks(history)
+        if not marks.empty:
+            writer.write('yahoofinance_history_mark', marks)
+        return [(stock_symbol, 'history') for stock_symbol in history['symbol'].unique()]
+
+    def load_history_marks(self):
+        """
+        Last stored bar and close per symbol in yahoofinance_history.
+        """
+        if not self.sql_helper.table_exists('yahoofinance_history_mark'):
+            return None
+        return self.sql_helper.fetch_data("SELECT symbol, last_date, last_close FROM public.yahoofinance_history_mark")
+
+    def _fetch_stock_data(self, stock_symbol, datasets=None):
         """
         Fetch data for a single stock symbol.
         :param stock_symbol: Stock symbol to fetch data for.
+        :param datasets: Datasets to fetch (defaults to all but history).
         :return: Dictionary of fetched data.
         """
         stock_data = StockData(stock_symbol, self.logger)
-        return stock_data.fetch_all_data()
-
-    # def _collect_data(self, stock_symbol_data: dict):
-    #     """
-    #     Collect and combine data from individual stock symbols into self.all_data_by_table.
-    #     :param stock_symbol_data: Dictionary containing the fetched data for a stock symbol.
-    #     """
-    #     for key, df in stock_symbol_data.items():
-    #         if not df.empty:
-    #             table_name = 'yahoofinance_' + key
-    #             if table_name not in self.all_data_by_table:
-    #                 # Initialize with the first dataframe
-    #                 self.all_data_by_table[table_name] = df
-    #             else:
-    #                 # Append the new data to the existing dataframe for that table
-    #                 self.all_data_by_table[table_name] = self.all_data_by_table[table_name].append(df, ignore_index=True)
-
-
-    def _collect_data(self, stock_symbol_data: dict):
-        """
-        Collect and combine data from individual stock symbols into self.all_data_by_table.
+        return stock_data.fetch_all_data(include_history=False, datasets=datasets)
+
+    def _collect_data(self, stock_symbol, stock_symbol_data: dict, writer):
+        """
+        Hand the fetched frames of one stock symbol to the run's writer.
         :param stock_symbol_data: Dictionary containing the fetched data for a stock symbol.
+        :return: (symbol, dataset) pairs that came back with data. Empty ones stay due.
         """
+        fetched = []
         for key, df in stock_symbol_data.items():
             if not df.empty:
-                table_name = 'yahoofinance_' + key
-                if table_name not in self.all_data_by_table:
-                    # Initialize with the first dataframe
-                    self.all_data_by_table[table_name] = df
-                else:
-                    # Concatenate the new data to the existing dataframe for that table
-                    self.all_data_by_table[table_name] = pd.concat([self.all_data_by_table[table_name], df], ignore_index=True)
+                writer.add('yahoofinance_' + key, df)
+                fetched.append((stock_symbol, key))
+        return fetched
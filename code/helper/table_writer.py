@@ -0,0 +1,99 @@
+import resource
+import sys
+import time
+import pandas as pd
+
+
+class TableWriter:
+    """
+    Per-table write buffers for a single pipeline run. Frames are appended to a table's buffer and the
+    buffer is written (one concat, one insert) as soon as it holds max_rows rows or max_bytes bytes, so
+    memory stays bounded by the thresholds instead of growing with the number of tickers. close() writes
+    whatever is left. Not thread-safe: add and flush from the thread that collects results.
+    """
+
+    def __init__(self, sql_helper, logger, max_rows=50000, max_bytes=64 * 1024 * 1024):
+        """
+        :param max_rows: Buffered rows of one table that trigger a write.
+        :param max_bytes: Buffered bytes (deep memory usage) of one table that trigger a write.
+        """
+        self.sql_helper = sql_helper
+        self.logger = logger
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.created_tables = set()
+        self.failed_tables = set()
+        self._buffers = {}  # table_name -> [frames, rows, bytes]
+        self._buffered_bytes = 0
+        self.stats = {'flushes': 0, 'rows': 0, 'errors': 0, 'peak_buffered_bytes': 0, 'seconds': 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, table_name, df):
+        if df is None or df.empty:
+            return
+        size = int(df.memory_usage(deep=True).sum())
+        buffer = self._buffers.setdefault(table_name, [[], 0, 0])
+        buffer[0].append(df)
+        buffer[1] += len(df)
+        buffer[2] += size
+        self._buffered_bytes += size
+        self.stats['peak_buffered_bytes'] = max(self.stats['peak_buffered_bytes'], self._buffered_bytes)
+        if buffer[1] >= self.max_rows or buffer[2] >= self.max_bytes:
+            self.flush(table_name)
+
+    def write(self, table_name, df):
+        """
+        Write a frame right away, together with anything already buffered for the table.
+        :return: False if the write failed.
+        """
+        self.add(table_name, df)
+        return self.flush(table_name)
+
+    def flush(self, table_name):
+        frames, rows, size = self._buffers.pop(table_name, ([], 0, 0))
+        if not frames:
+            return True
+        self._buffered_bytes -= size
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        start_time = time.perf_counter()
+        try:
+            if table_name not in self.created_tables:
+                self.sql_helper.create_table(table_name, df.dtypes)
+                self.created_tables.add(table_name)
+            self.sql_helper.update_table_schema(table_name, df)
+            if not self.sql_helper.insert_data(table_name, df):
+                raise RuntimeError(f"table {table_name} does not exist")
+            self.stats['flushes'] += 1
+            self.stats['rows'] += rows
+            return True
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.failed_tables.add(table_name)
+            self.logger.error(f"Error writing {rows} rows to {table_name}: {str(e)}")
+            return False
+        finally:
+            self.stats['seconds'] += time.perf_counter() - start_time
+
+    def flush_all(self):
+        for table_name in list(self._buffers):
+            self.flush(table_name)
+
+    def close(self):
+        self.flush_all()
+        self.logger.info(
+            f"TableWriter: {self.stats['rows']} rows in {self.stats['flushes']} flushes "
+            f"({self.stats['errors']} failed, {self.stats['seconds']:.2f}s writing), "
+            f"peak buffered {self.stats['peak_buffered_bytes'] / 1e6:.1f} MB, "
+            f"process peak RSS {peak_rss_bytes() / 1e6:.1f} MB"
+        )
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -2,15 +2,205 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from helper.rate_limiter import get_rate_limiter
+
+YAHOO_HOST = 'finance.yahoo.com'
+YAHOO_REQUESTS_PER_SECOND = 5
+HISTORY_CHUNK_SIZE = 100  # symbols per yf.download request
+HISTORY_OVERLAP_DAYS = 7  # calendar days re-fetched before the high-water mark
+ADJUSTMENT_TOLERANCE = 1e-4  # relative change of a stored close that counts as a split/dividend adjustment
+
+
+def _is_daily(interval):
+    # yfinance's own split: minute and hour bars carry a time of day, everything else is keyed by day
+    return interval[-1] not in ('m', 'h')
+
+
+class HistoryDownloader:
+    """
+    Price history for a whole ticker list through yfinance's multi-ticker download, chunk_size symbols
+    per request instead of one Ticker.history call each. The wide (ticker, field) result is reshaped
+    into the yahoofinance_history layout with a single stack, so no per-ticker frame is ever built.
+    """
+
+    def __init__(self, logger, chunk_size=HISTORY_CHUNK_SIZE, overlap_days=HISTORY_OVERLAP_DAYS):
+        self.logger = logger
+        self.chunk_size = chunk_size
+        self.overlap_days = overlap_days
+        self.current_date = datetime.today().strftime('%Y-%m-%d')
+        self.missing = []
+        self.stats = {'full': 0, 'incremental': 0, 'adjusted': 0}
+
+    def fetch(self, tickers, period="max", interval="1d", start=None):
+        """
+        :param start: First bar to fetch (YYYY-MM-DD); overrides period.
+        :return: One long DataFrame with a row per symbol and bar; symbols without data are in self.missing.
+        """
+        tickers = list(dict.fromkeys(ticker.strip() for ticker in tickers))
+        window = {'start': start} if start else {'period': period}
+        frames = []
+        missing = []
+        for i in range(0, len(tickers), self.chunk_size):
+            chunk = tickers[i:i + self.chunk_size]
+            # One token per grouped request: the download is what the per-ticker calls are traded against
+            get_rate_limiter(YAHOO_HOST, YAHOO_REQUESTS_PER_SECOND).acquire()
+            try:
+                data = yf.download(chunk, interval=interval, group_by='ticker', auto_adjust=True,
+                                   actions=True, threads=True, progress=False, **window)
+            except Exception as e:
+                self.logger.error(f"Error downloading history for {len(chunk)} tickers: {str(e)}")
+                missing.extend(chunk)
+                continue
+            history = self._to_long(data, chunk, interval)
+            missing.extend(sorted(set(chunk) - set(history['symbol'])))
+            frames.append(history)
+
+        if missing:
+            self.logger.warning(f"No history returned for: {', '.join(missing)}")
+            self.missing.extend(missing)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def fetch_since(self, tickers, marks):
+        """
+        Daily bars after each symbol's high-water mark, plus overlap_days before it. Symbols without a mark,
+        and symbols whose marked close changed since it was stored (a split or dividend re-adjusted the
+        series), are fetched in full instead.
+        :param marks: DataFrame of symbol, last_date, last_close (see history_marks).
+        """
+        tickers = list(dict.fromkeys(ticker.strip() for ticker in tickers))
+        marks = marks[marks['symbol'].isin(tickers)] if marks is not None and not marks.empty else pd.DataFrame(
+            columns=['symbol', 'last_date', 'last_close'])
+        full = [ticker for ticker in tickers if ticker not in set(marks['symbol'])]
+
+        # Symbols marked on the same day share a start date, so they still go out in grouped requests
+        frames = []
+        starts = pd.to_datetime(marks['last_date']) - pd.Timedelta(days=self.overlap_days)
+        for start, group in marks.groupby(starts.dt.strftime('%Y-%m-%d')):
+            history = self.fetch(group['symbol'], start=start)
+            if history.empty:
+                continue
+            adjusted = self._adjusted_symbols(history, group)
+            full.extend(adjusted)
+            self.stats['adjusted'] += len(adjusted)
+            frames.append(history[~history['symbol'].isin(adjusted)])
+
+        self.stats['incremental'] += len(tickers) - len(full)
+        self.stats['full'] += len(full)
+        if full:
+            frames.append(self.fetch(full))
+        self.logger.info(f"History: {self.stats['incremental']} incremental, {self.stats['full']} full "
+                         f"({self.stats['adjusted']} re-adjusted)")
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _adjusted_symbols(self, history, marks):
+        """
+        Symbols whose bar at the high-water mark no longer matches the stored close, or that paid a dividend
+        or split after it. Either way every earlier adjusted bar has moved too.
+        """
+        # Symbols with no bars at all are reported as missing by fetch, not refetched in full
+        marks = marks[marks['symbol'].isin(history['symbol'])]
+        marks = marks.assign(date=pd.to_datetime(marks['last_date']).dt.strftime('%Y-%m-%d'))
+        overlap = marks.merge(history[['symbol', 'date', 'close']], on=['symbol', 'date'], how='left')
+        changed = ~((overlap['close'] - overlap['last_close']).abs() <= ADJUSTMENT_TOLERANCE * overlap['last_close'].abs())
+
+        new_bars = history.merge(marks[['symbol', 'date']], on='symbol', suffixes=('', '_mark'))
+        new_bars = new_bars[new_bars['date'] > new_bars['date_mark']]
+        actions = new_bars[(new_bars['dividends'].fillna(0) != 0) | (new_bars['stock_splits'].fillna(0) != 0)]
+
+        return sorted(set(overlap.loc[changed, 'symbol']) | set(actions['symbol']))
+
+    def history_marks(self, history):
+        """
+        High-water mark per symbol: its last completed bar and that bar's close, to compare against on the
+        next run. Today's bar is still moving while the session is open, so marking it would make the next
+        run see a changed close and refetch the symbol in full; it is picked up again by the overlap window.
+        Symbols with only today's bar get no row and keep their previous mark.
+        """
+        completed = history[history['date'].astype(str).str[:10] < self.current_date]
+        last = completed.sort_values('date').groupby('symbol').tail(1)
+        return pd.DataFrame({
+            'symbol': last['symbol'].values,
+            'last_date': last['date'].values,
+            'last_close': last['close'].values,
+            'date_insert': self.current_date,
+        })
+
+    def _to_long(self, data, tickers, interval):
+        if data.empty:
+            return pd.DataFrame(columns=['date', 'symbol'])
+        if not isinstance(data.columns, pd.MultiIndex):
+            # A single-symbol download comes back without the ticker level
+            data.columns = pd.MultiIndex.from_product([tickers, data.columns])
+
+        history = data.stack(level=0, future_stack=True)
+        history.index.names = ['date', 'symbol']
+        # The shared date index covers every symbol's range; bars before a listing are all NaN
+        history = history.dropna(subset=['Close']).reset_index()
+        history.columns = [col.lower().replace(' ', '_')[:59] for col in history.columns]
+        if _is_daily(interval):
+            history['date'] = history['date'].dt.strftime('%Y-%m-%d')
+        history['volume'] = history['volume'].astype('Int64')
+        history['date_insert'] = self.current_date
+        history['ticker_name'] = history['symbol']
+        return history
+
 
 class StockData:
-    def __init__(self, ticker, logger):
+    # Ticker attributes behind each dataset; every attribute is one Yahoo endpoint call
+    FETCH_PLAN = {
+        'metadata': ('history_metadata', 'info'),
+        'insider_roster_holders': ('insider_roster_holders',),
+        'holders': ('mutualfund_holders', 'institutional_holders'),
+        'cash_flow': ('cashflow', 'quarterly_cash_flow'),
+        'balance_sheet': ('balance_sheet', 'quarterly_balance_sheet'),
+        'income_statement': ('income_stmt', 'quarterly_incomestmt'),
+    }
+
+    def __init__(self, ticker, logger, requests_per_second=YAHOO_REQUESTS_PER_SECOND):
+        """
+        :param requests_per_second: Ceiling for Yahoo calls, shared by every StockData in the process.
+        """
         self.ticker = ticker.strip()
         self.company = yf.Ticker(ticker)
         self.data_frames = {}
         self.current_date = datetime.today().strftime('%Y-%m-%d')
         self.logger = logger
+        self.rate_limiter = get_rate_limiter(YAHOO_HOST, requests_per_second)
+        self._endpoints = {}
+        self._endpoints_lock = threading.Lock()
+
+    def _endpoint(self, name):
+        """
+        Value of a Ticker attribute, requested at most once per StockData. A failure is remembered too,
+        so datasets sharing an endpoint (info, history_metadata) do not retry it behind each other's back.
+        """
+        with self._endpoints_lock:
+            if name in self._endpoints:
+                value = self._endpoints[name]
+                if isinstance(value, Exception):
+                    raise value
+                return value
+        self.rate_limiter.acquire()
+        try:
+            value = getattr(self.company, name)
+        except Exception as e:
+            value = e
+        with self._endpoints_lock:
+            self._endpoints[name] = value
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def _prefetch(self, executor, names):
+        # Errors stay memoized in _endpoints and surface in the fetch_* method that needs the endpoint
+        for name in names:
+            executor.submit(self._endpoint, name)
 
     def _add_meta_data(self, df):
         df['date_insert'] = self.current_date
@@ -21,6 +211,10 @@ class StockData:
         df.columns = [col.lower().replace(' ', '_')[:59] for col in df.columns]
         return df
 
+    def _get_frequency(self, df_annual, df_quarterly):
+        # Annual and quarterly statements can share a period end date, so tag each transposed row with its source
+        return ['annual'] * df_annual.shape[1] + ['quarterly'] * df_quarterly.shape[1]
+
     def _is_empty(self, result):
         if isinstance(result, pd.DataFrame):
             return result.empty
@@ -39,6 +233,8 @@ class StockData:
                         self.logger.error(f"Attempt {attempt + 1} failed. Retrying in {delay} second(s)...")
                         time.sleep(delay)
                         self.company = yf.Ticker(self.ticker)
+                        with self._endpoints_lock:
+                            self._endpoints.clear()
                     else:
                         self.logger.error(f"All attempts failed. Last error: {result}")
                         return pd.DataFrame()
@@ -55,14 +251,18 @@ class StockData:
         return pd.DataFrame()
 
     def fetch_info(self):
-        return self._retry_operation(self.company.info.copy)
+        return self._retry_operation(lambda: self._endpoint('info').copy())
 
     def fetch_history(self, period="max", interval="1d"):
         def fetch_operation():
             try:
+                self.rate_limiter.acquire()
                 history = self.company.history(period=period, interval=interval).reset_index()
                 history.rename(columns={'index': 'date'}, inplace=True)
                 history = self._format_columns(history)
+                if _is_daily(interval):
+                    # Same trading-day key as HistoryDownloader, whatever the exchange timezone
+                    history['date'] = history['date'].dt.strftime('%Y-%m-%d')
                 history['symbol'] = self.ticker
                 history = self._add_meta_data(history)
                 history = history.fillna(np.nan)
@@ -78,7 +278,8 @@ class StockData:
     def fetch_metadata(self):
         def fetch_operation():
             try:
-                metadata = self.company.history_metadata
+                # Copied: the memoized dict must not lose the keys deleted below
+                metadata = dict(self._endpoint('history_metadata'))
                 keys_to_delete = ['currentTradingPeriod', 'dataGranularity', 'range', 'validRanges']
                 for key in keys_to_delete:
                     if key in metadata:
@@ -105,7 +306,7 @@ class StockData:
     def fetch_insider_roster_holders(self):
         def fetch_operation():
             try:
-                df_insider = self.company.insider_roster_holders
+                df_insider = self._endpoint('insider_roster_holders')
                 df_insider = self._format_columns(df_insider)
                 df_insider['symbol'] = self.ticker
                 df_insider = self._add_meta_data(df_insider)
@@ -122,9 +323,9 @@ class StockData:
     def fetch_holders(self):
         def fetch_operation():
             try:
-                df_holders = self.company.mutualfund_holders
+                df_holders = self._endpoint('mutualfund_holders')
                 df_holders['type'] = 'mutual'
-                df_institutional = self.company.institutional_holders
+                df_institutional = self._endpoint('institutional_holders')
                 df_institutional['type'] = 'institutional'
                 df_holders = pd.concat([df_holders, df_institutional])
                 df_holders = self._format_columns(df_holders)
@@ -143,10 +344,13 @@ class StockData:
     def fetch_cashflow(self):
         def fetch_operation():
             try:
-                df_cashflow = pd.concat([self.company.cashflow, self.company.quarterly_cash_flow], axis=1)
+                df_annual = self._endpoint('cashflow')
+                df_quarterly = self._endpoint('quarterly_cash_flow')
+                df_cashflow = pd.concat([df_annual, df_quarterly], axis=1)
                 df_cashflow = df_cashflow.T.astype(float).round(2).reset_index()
                 df_cashflow.rename(columns={'index': 'date'}, inplace=True)
                 df_cashflow = self._format_columns(df_cashflow)
+                df_cashflow['frequency'] = self._get_frequency(df_annual, df_quarterly)
                 df_cashflow['symbol'] = self.ticker
                 df_cashflow = self._add_meta_data(df_cashflow)
                 df_cashflow = df_cashflow.fillna(np.nan)
@@ -162,10 +366,13 @@ class StockData:
     def fetch_balance_sheet(self):
         def fetch_operation():
             try:
-                df_balance_sheet = pd.concat([self.company.balance_sheet, self.company.quarterly_balance_sheet], axis=1)
+                df_annual = self._endpoint('balance_sheet')
+                df_quarterly = self._endpoint('quarterly_balance_sheet')
+                df_balance_sheet = pd.concat([df_annual, df_quarterly], axis=1)
                 df_balance_sheet = df_balance_sheet.T.astype(float).round(2).reset_index()
                 df_balance_sheet.rename(columns={'index': 'date'}, inplace=True)
                 df_balance_sheet = self._format_columns(df_balance_sheet)
+                df_balance_sheet['frequency'] = self._get_frequency(df_annual, df_quarterly)
                 df_balance_sheet['symbol'] = self.ticker
                 df_balance_sheet = self._add_meta_data(df_balance_sheet)
                 df_balance_sheet = df_balance_sheet.fillna(np.nan)
@@ -181,10 +388,13 @@ class StockData:
     def fetch_income_statement(self):
         def fetch_operation():
             try:
-                df_income_stmt = pd.concat([self.company.income_stmt, self.company.quarterly_incomestmt], axis=1)
+                df_annual = self._endpoint('income_stmt')
+                df_quarterly = self._endpoint('quarterly_incomestmt')
+                df_income_stmt = pd.concat([df_annual, df_quarterly], axis=1)
                 df_income_stmt = df_income_stmt.T.astype(float).round(2).reset_index()
                 df_income_stmt.rename(columns={'index': 'date'}, inplace=True)
                 df_income_stmt = self._format_columns(df_income_stmt)
+                df_income_stmt['frequency'] = self._get_frequency(df_annual, df_quarterly)
                 df_income_stmt['symbol'] = self.ticker
                 df_income_stmt = self._add_meta_data(df_income_stmt)
                 df_income_stmt = df_income_stmt.fillna(np.nan)
@@ -197,21 +407,30 @@ class StockData:
         self.data_frames['income_statement'] = income_statement if income_statement is not None else pd.DataFrame()
         return self.data_frames['income_statement']
 
-    def fetch_all_data(self):
-        self.logger.info('Processing history data...')
-        self.fetch_history()
-        self.logger.info('Processing metadata...')
-        self.fetch_metadata()
-        self.logger.info('Processing insider roster and holders...')
-        self.fetch_insider_roster_holders()
-        self.logger.info('Processing holders...')
-        self.fetch_holders()
-        self.logger.info('Processing cash flow...')
-        self.fetch_cashflow()
-        self.logger.info('Processing balance sheet...')
-        self.fetch_balance_sheet()
-        self.logger.info('Processing income statement...')
-        self.fetch_income_statement()
-
-        time.sleep(1)
+    def fetch_all_data(self, include_history=True, datasets=None):
+        """
+        Request every endpoint of the fetch plan concurrently (annual and quarterly statements included),
+        then build the datasets from the memoized responses, so the wall time is set by the slowest
+        endpoint instead of their sum. The shared rate limiter keeps the overall call rate polite.
+        :param include_history: False when the history comes from a HistoryDownloader batch instead.
+        :param datasets: FETCH_PLAN keys to fetch (defaults to all of them), e.g. only the stale ones.
+        """
+        builders = {
+            'metadata': self.fetch_metadata,
+            'insider_roster_holders': self.fetch_insider_roster_holders,
+            'holders': self.fetch_holders,
+            'cash_flow': self.fetch_cashflow,
+            'balance_sheet': self.fetch_balance_sheet,
+            'income_statement': self.fetch_income_statement,
+        }
+        datasets = [dataset for dataset in builders if datasets is None or dataset in datasets]
+        names = list(dict.fromkeys(name for dataset in datasets for name in self.FETCH_PLAN[dataset]))
+        with ThreadPoolExecutor(max_workers=len(names) + 1) as executor:
+            if include_history:
+                executor.submit(self.fetch_history)
+            self._prefetch(executor, names)
+
+        self.logger.info(f'Building datasets for {self.ticker}...')
+        for dataset in datasets:
+            builders[dataset]()
         return self.data_frames
@@ -2,8 +2,12 @@ import logging
 from typing import Dict
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import text, inspect
 import json
+from helper.migration_processor import MigrationProcessor
+from helper.engine_registry import get_engine
+from helper.sql_processor import CloudSQLDatabase
+from helper.cusip_map import CusipMap
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -58,18 +62,52 @@ def create_tables(engine, table_queries: Dict[str, str]):
 
 
 
+def run_migrations(engine, file_path: str) -> None:
+    """
+    Apply pending schema migrations. Safe to re-run: applied versions are skipped and an
+    interrupted column conversion resumes from its last committed batch.
+    """
+    migration_processor = MigrationProcessor(engine, logger)
+    migrations = migration_processor.load_migrations(file_path)
+    migration_processor.run(migrations)
+    logger.info("Schema migrations are up to date.")
+
+
+def load_cusip_map(env_vars: Dict[str, str], file_path: str) -> None:
+    """
+    Bulk-load CUSIP_MAP.json into cusip_map. Rows are merged on cusip (unique index), so re-running
+    only touches pairs that changed.
+    """
+    sql_helper = CloudSQLDatabase(
+        env_vars['SQL_USER'],
+        env_vars['SQL_PASSWORD'],
+        env_vars['SQL_HOST'],
+        env_vars['SQL_PORT'],
+        env_vars['SQL_DATABASE'],
+        logger=logger
+    )
+    try:
+        df = CusipMap.from_json(file_path).to_frame()
+        sql_helper.insert_data('cusip_map', df)
+        logger.info(f"Loaded {len(df)} CUSIP mappings into cusip_map.")
+    finally:
+        sql_helper.close_connection()
+
+
 def main():
     """Main function."""
     try:
         env_vars = load_environment_variables()
 
         db_url = f"postgresql+psycopg2://{env_vars['SQL_USER']}:{env_vars['SQL_PASSWORD']}@{env_vars['SQL_HOST']}:{env_vars['SQL_PORT']}/{env_vars['SQL_DATABASE']}"
-        engine = create_engine(db_url)
+        engine = get_engine(db_url)
 
         with open('./data/DB_INIT.json', 'r') as f:
             table_creation_queries = json.load(f)
 
         create_tables(engine, table_creation_queries)
+        load_cusip_map(env_vars, './data/CUSIP_MAP.json')
+        run_migrations(engine, './data/MIGRATIONS.json')
 
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}", exc_info=True)
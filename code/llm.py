@@ -5,6 +5,7 @@ import json
 from dotenv import load_dotenv
 from helper.sql_processor import CloudSQLDatabase
 from helper.llm_processor import LLMProcessor
+from helper.pipeline_processor import LLM_QUERY_NAMES
 from yahoofinance import main as process_llm
 import pandas as pd
 
@@ -57,20 +58,18 @@ def main():
         # Initialize LLM helper
         llm_helper = LLMProcessor(env_vars['API_KEY'], env_vars['MODEL'])
 
+        # The queries read the mv_* views; refresh them so this run sees what the ingestion scripts just wrote
+        with open('./data/MATVIEW.json', 'r') as f:
+            sql_helper.refresh_materialized_views(json.load(f))
+
         # Load query configurations
         with open('./data/QUERY.json', 'r') as f:
             QUERY = json.load(f)
 
-        # Fetch data using SQL helper
-        data_frames = {
-            'insider_buying_activity': sql_helper.fetch_data(QUERY['insider_buying_activity']),
-            'insider_buying_activity_with_superinvestor': sql_helper.fetch_data(QUERY['insider_buying_activity_with_superinvestor']),
-            'custom_insider': sql_helper.fetch_data(QUERY['custom_insider']),
-            '52week_lows': sql_helper.fetch_data(QUERY['52week_lows']),
-            '13f_filing': sql_helper.fetch_data(QUERY['13f_filing']),
-            'custom_screen': sql_helper.fetch_data(QUERY['custom_screen']),
-            'screen_magic': sql_helper.fetch_data(QUERY['screen_magic'])
-        }
+        # Fetch data using SQL helper, all queries concurrently
+        data_frames = sql_helper.fetch_data_batch({
+            name: QUERY[name] for name in LLM_QUERY_NAMES
+        })
 
         # Process unique funds
         filing_13f = data_frames['13f_filing']
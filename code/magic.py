@@ -1,3 +1,4 @@
+import json
 import logging
 from typing import Dict
 import os
@@ -53,8 +54,10 @@ def main():
         # Fetch stock screening data using MagicFormulaInvesting
         email = env_vars['MAGIC_USER']
         password = env_vars['MAGIC_PW']
+        with open('./data/MAGIC_SCREEN.json', 'r') as f:
+            variants = json.load(f)
         mfi = MagicFormulaInvesting(email, password)
-        stock_df = mfi.get_stock_screening()
+        stock_df = mfi.get_stock_screenings(variants)
 
         # Define the table name
         table_name = 'magic_screen'
@@ -31,7 +31,7 @@ async def process_llm_request():
     try:
         content = cl.chat_context.to_openai()
         if content:
-            respond = await cl.make_async(pipeline_processor.route_prompt)(prompt_object=content)
+            respond = await pipeline_processor.route_prompt_async(prompt_object=content)
             return respond.choices[0].message.content
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}", exc_info=True)
@@ -1,3 +1,5 @@
+import argparse
+import datetime
 import json
 import logging
 from typing import Dict
@@ -35,10 +37,13 @@ def load_cik_list(file_path: str) -> Dict:
         logger.error(f"Invalid JSON in CIK list file: {file_path}")
         raise
 
-def process_sec_data(cik_list: Dict) -> pd.DataFrame:
-    """Process SEC data using SecProcessor."""
-    processor = SecProcessor(cik_list)
+def process_sec_data(cik_list: Dict, quarters: int = 1, seen_accessions=None):
+    """Process SEC data using SecProcessor. Returns the holdings and the metadata of the new filings."""
+    processor = SecProcessor(cik_list, quarters=quarters, seen_accessions=seen_accessions)
     df = processor.process_all_funds()
+    df_filings = pd.DataFrame(processor.filings)
+    if df is None:
+        return pd.DataFrame(), df_filings
     
     # Convert other numeric columns as needed
     numeric_columns = ['value', 'voting_sole', 'voting_shared', 'voting_none', 'prn_amt']
@@ -46,11 +51,10 @@ def process_sec_data(cik_list: Dict) -> pd.DataFrame:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
     df = df.drop_duplicates()
-    return df
+    return df, df_filings
 
-def insert_data_to_sql(df: pd.DataFrame, env_vars: Dict[str, str]) -> None:
-    """Insert data into SQL database."""
-    sql_helper = CloudSQLDatabase(
+def get_sql_helper(env_vars: Dict[str, str]) -> CloudSQLDatabase:
+    return CloudSQLDatabase(
         env_vars['sql_user'],
         env_vars['sql_password'],
         env_vars['sql_host'],
@@ -59,29 +63,54 @@ def insert_data_to_sql(df: pd.DataFrame, env_vars: Dict[str, str]) -> None:
         big_flag=True,
         logger=logger
     )
-    table_name = 'sec_13f'
+
+def load_seen_accessions(sql_helper: CloudSQLDatabase) -> set:
+    """Accession numbers already ingested, so their documents are not fetched again."""
+    if not sql_helper.table_exists('sec_13f_accession'):
+        return set()
+    df = sql_helper.fetch_data("SELECT accession_number FROM public.sec_13f_accession")
+    return set() if df is None else set(df['accession_number'])
+
+def insert_data_to_sql(sql_helper: CloudSQLDatabase, df: pd.DataFrame, table_name: str) -> None:
+    """Insert data into SQL database."""
     try:
         logger.info("Inserting data into SQL table %s", table_name)
         
         sql_helper.create_table(table_name, df.dtypes)
-        sql_helper.insert_data(table_name, df)
+        # insert_data raises on a failed write; False means the table was never created
+        if not sql_helper.insert_data(table_name, df):
+            raise RuntimeError(f"table {table_name} does not exist")
         
     except Exception as e:
         logger.error(f"Error inserting data into SQL: {str(e)}")
         raise
-    finally:
-        sql_helper.close_connection()
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quarters', type=int, default=1, help='13F-HR filings to ingest per fund (backfill depth)')
+    args = parser.parse_args()
+
+    sql_helper = None
     try:
         env_vars = load_environment_variables()
         cik_list = load_cik_list('./data/CIK_LIST.json')
-        df_sec = process_sec_data(cik_list)
-        insert_data_to_sql(df_sec, env_vars)
+        sql_helper = get_sql_helper(env_vars)
+        seen_accessions = load_seen_accessions(sql_helper)
+        df_sec, df_filings = process_sec_data(cik_list, args.quarters, seen_accessions)
+        if df_sec.empty:
+            logger.info("No new 13F filings since the last run.")
+            return
+        insert_data_to_sql(sql_helper, df_sec, 'sec_13f')
+        # Only mark filings as seen once their rows are stored: a failed sec_13f write raised above
+        df_filings['date_insert'] = datetime.datetime.today().strftime('%Y-%m-%d')
+        insert_data_to_sql(sql_helper, df_filings, 'sec_13f_accession')
         logger.info("Data processing and insertion completed successfully.")
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}")
+    finally:
+        if sql_helper is not None:
+            sql_helper.close_connection()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()